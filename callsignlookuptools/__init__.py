@@ -12,20 +12,32 @@ from importlib.util import find_spec
 
 from .__info__ import __version__
 
-from .common.dataclasses import CallsignData
-from .common.exceptions import CallsignLookupError
+from .common.cache import LookupCache, SqliteResponseCache
+from .common.circuit import CircuitBreaker
+from .common.concurrency import AdaptiveConcurrency
+from .common.dataclasses import CallsignData, MergedCallsignData
+from .common.exceptions import (CallsignLookupError, CallsignNotFoundError, CircuitOpenError, LookupConnectionError,
+                                LookupHttpError, LookupTimeoutError, AllSourcesFailedError, QuotaExceededError)
+from .common.ratelimit import RateLimiter, TokenBucket, default_rate_limiter
+from .common.retry import RetryPolicy
+from .common.sessionstore import SqliteSessionStore
+from .common.timeout import Timeout
+from .common.transport import Transport
+from .multi.multi import SourceStats
 
 if find_spec("requests"):
     from .qrz.qrzsync import QrzSyncClient
     from .callook.callooksync import CallookSyncClient
     from .hamqth.hamqthsync import HamQthSyncClient
     from .qrzcq.qrzcqsync import QrzCqSyncClient
+    from .multi.multisync import FallbackSyncClient
     pass
 if find_spec("aiohttp"):
     from .qrz.qrzasync import QrzAsyncClient
     from .callook.callookasync import CallookAsyncClient
     from .hamqth.hamqthasync import HamQthAsyncClient
     from .qrzcq.qrzcqasync import QrzCqAsyncClient
+    from .multi.multiasync import FallbackAsyncClient, AggregateAsyncClient, AccountPoolAsyncClient
     pass
 if not find_spec("requests") and not find_spec("aiohttp"):
     raise ModuleNotFoundError("At least one of requests or aiohttp needs to be installed to use callsignlookuptools")
@@ -6,6 +6,7 @@ Released under the terms of the BSD 3-Clause license.
 """
 
 
+from pathlib import Path
 from sys import stderr
 from typing import Optional
 
@@ -48,12 +49,15 @@ def qrz(
                                  help="QRZ username (will prompt if not provided)"),
     password: str = typer.Option(..., "--pass", "--password", "-p", prompt=True, hide_input=True,
                                  help="QRZ password (will prompt if not provided)"),
+    session_store: Optional[Path] = typer.Option(None, "--session-store", "-s",
+                                                 envvar="CALLSIGNLOOKUPTOOLS_SESSION_STORE",
+                                                 help="File to keep the session key in, to reuse it in later runs"),
     call: str = typer.Argument(..., help="The callsign to look up"),
 ):
     """Use QRZ to look up a callsign
 
     Requires a QRZ account and an XML Logbook Data or QRZ Premium subscription"""
-    run_query(DataSource.QRZ, call, username, password)
+    run_query(DataSource.QRZ, call, username, password, session_store)
 
 
 @app.command()
@@ -70,12 +74,15 @@ def hamqth(
                                  help="HamQTH username (will prompt if not provided)"),
     password: str = typer.Option(..., "--pass", "--password", "-p", prompt=True, hide_input=True,
                                  help="HamQTH password (will prompt if not provided)"),
+    session_store: Optional[Path] = typer.Option(None, "--session-store", "-s",
+                                                 envvar="CALLSIGNLOOKUPTOOLS_SESSION_STORE",
+                                                 help="File to keep the session key in, to reuse it in later runs"),
     call: str = typer.Argument(..., help="The callsign to look up"),
 ):
     """Use HamQTH to look up a callsign
 
     Requires a HamQTH account"""
-    run_query(DataSource.HAMQTH, call, username, password)
+    run_query(DataSource.HAMQTH, call, username, password, session_store)
 
 
 @app.command()
@@ -84,12 +91,15 @@ def qrzcq(
                                  help="QRZCQ username (will prompt if not provided)"),
     password: str = typer.Option(..., "--pass", "--password", "-p", prompt=True, hide_input=True,
                                  help="QRZCQ password (will prompt if not provided)"),
+    session_store: Optional[Path] = typer.Option(None, "--session-store", "-s",
+                                                 envvar="CALLSIGNLOOKUPTOOLS_SESSION_STORE",
+                                                 help="File to keep the session key in, to reuse it in later runs"),
     call: str = typer.Argument(..., help="The callsign to look up"),
 ):
     """Use QRZCQ to look up a callsign
 
     Requires a QRZCQ account and a QRZCQ Premium subscription"""
-    run_query(DataSource.QRZCQ, call, username, password)
+    run_query(DataSource.QRZCQ, call, username, password, session_store)
 
 
 if __name__ == "__main__":
@@ -14,6 +14,10 @@ from gridtools import Grid, LatLong
 from pydantic import BaseModel, Field, validator
 
 from ..common import abcs, enums, dataclasses, exceptions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 
 
 class CallookCallsignModel(BaseModel):
@@ -101,13 +105,20 @@ class CallookDataModel(BaseModel):
 class CallookClientAbc(abcs.LookupAbc, ABC):
     """The base class for CallookSyncClient and CallookAsyncClient. **This should not be used directly.**"""
     _base_url = "https://callook.info/{}/json"
-
-    def __init__(self):
-        pass
-
-    @abstractmethod
-    def search(self, callsign: str) -> dataclasses.CallsignData:
-        pass
+    _data_source = enums.DataSource.CALLOOK
+
+    def __init__(self, *, cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 keep_raw_data: bool = True):
+        self._cache = cache
+        self._response_cache = response_cache
+        self._retry = retry
+        self._timeout = timeout
+        self._transport = transport
+        self._keep_raw_data = keep_raw_data
 
     @abstractmethod
     def _do_query(self, **query) -> bytes:
@@ -116,12 +127,15 @@ class CallookClientAbc(abcs.LookupAbc, ABC):
     def _process_search(self, query: str, resp: bytes) -> dataclasses.CallsignData:
         model_data = CallookDataModel.parse_raw(resp)
 
+        if model_data.status == enums.CallookStatus.UPDATING:
+            raise exceptions.CallsignLookupError("Callook is updating its database, try again later")
+
         if model_data.status != enums.CallookStatus.VALID or not model_data.current.callsign:
-            raise exceptions.CallsignLookupError("No data found for query " + query)
+            raise exceptions.CallsignNotFoundError("No data found for query " + query)
 
         calldata = dataclasses.CallsignData(
             query=query,
-            raw_data=model_data,
+            raw_data=model_data if self._keep_raw_data else None,
             data_source=enums.DataSource.CALLOOK
         )
 
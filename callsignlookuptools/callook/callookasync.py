@@ -6,12 +6,16 @@ Released under the terms of the BSD 3-Clause license.
 """
 
 
+import asyncio
 from typing import Optional
 
 import aiohttp
 
-from ..common import mixins, dataclasses, exceptions
-from ..common.functions import is_callsign
+from ..common import mixins, exceptions, functions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 from .callook import CallookClientAbc
 
 
@@ -19,39 +23,65 @@ class CallookAsyncClient(mixins.AsyncMixin, CallookClientAbc):
     """Asynchronous Callook API client
 
     :param session: An aiohttp session to use for requests
+    :param cache: A cache to answer searches from and store results in
+    :param response_cache: A persistent cache to store raw responses in and answer searches from
+    :param retry: A policy for retrying requests that fail with a connection or HTTP error
+    :param timeout: Timeouts for requests to the lookup source, and the default deadline for searches
+    :param transport: Connection pooling settings and shared sessions, used if no session is given
+    :param keep_raw_data: Keep the raw data in results. If ``False``, :attr:`CallsignData.raw_data`
+        is ``None``, saving memory in large caches
     """
-    def __init__(self, session: Optional[aiohttp.ClientSession] = None):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, *,
+                 cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 keep_raw_data: bool = True):
         self._session = session
-        super().__init__()
+        super().__init__(cache=cache, response_cache=response_cache, retry=retry, timeout=timeout, transport=transport,
+                         keep_raw_data=keep_raw_data)
 
     @classmethod
-    async def new(cls, session: Optional[aiohttp.ClientSession] = None) -> 'CallookAsyncClient':
+    async def new(cls, session: Optional[aiohttp.ClientSession] = None, *,
+                  cache: Optional[LookupCache] = None,
+                  response_cache: Optional[SqliteResponseCache] = None,
+                  retry: Optional[RetryPolicy] = None,
+                  timeout: Timeout = Timeout(),
+                  transport: Optional[Transport] = None,
+                  keep_raw_data: bool = True) -> 'CallookAsyncClient':
         """Creates a ``CallookAsyncClient`` object and automatically starts a session if not provided.
 
         :param session: An aiohttp session to use for requests
+        :param cache: A cache to answer searches from and store results in
+        :param response_cache: A persistent cache to store raw responses in and answer searches from
+        :param retry: A policy for retrying requests that fail with a connection or HTTP error
+        :param timeout: Timeouts for requests to the lookup source, and the default deadline for searches
+        :param transport: Connection pooling settings and shared sessions, used if no session is given
+        :param keep_raw_data: Keep the raw data in results. If ``False``, :attr:`CallsignData.raw_data`
+            is ``None``, saving memory in large caches
         """
-        obj = cls(session)
+        obj = cls(session, cache=cache, response_cache=response_cache, retry=retry, timeout=timeout,
+                  transport=transport, keep_raw_data=keep_raw_data)
         if obj.session is None:
             await obj.start_session()
         return obj
 
-    async def search(self, callsign: str) -> dataclasses.CallsignData:  # type: ignore[override]
-        if not is_callsign(callsign):
-            raise exceptions.CallsignLookupError("Invalid Callsign")
-
-        return self._process_search(
-            query=callsign.upper(),
-            resp=await self._do_query(
-                callsign=callsign.upper()
-            )
-        )
-
     async def _do_query(self, **query) -> bytes:  # type: ignore[override]
         if self._session is not None:
-            async with self._session.get(self._base_url.format(query["callsign"])) as resp:
-                if resp.status != 200:
-                    raise exceptions.CallsignLookupError(f"Unable to connect to Callook (HTTP Error {resp.status})")
-                return await resp.read()
+            try:
+                async with self._session.get(self._base_url.format(query["callsign"]),
+                                             timeout=self._request_timeout()) as resp:
+                    if resp.status != 200:
+                        raise exceptions.LookupHttpError(
+                            f"Unable to connect to Callook (HTTP Error {resp.status})", status=resp.status,
+                            retry_after=functions.parse_retry_after(resp.headers.get("Retry-After", None))
+                        )
+                    return await resp.read()
+            except asyncio.TimeoutError as e:
+                raise exceptions.LookupTimeoutError("Timed out waiting for Callook") from e
+            except aiohttp.ClientError as e:
+                raise exceptions.LookupConnectionError(f"Unable to connect to Callook ({e})") from e
         else:
             raise exceptions.CallsignLookupError(("Session not initialised. "
                                                   "Hint: Call `.start_session()` once or use the `new()` classmethod."))
@@ -10,8 +10,11 @@ from typing import Optional
 
 import requests
 
-from ..common import mixins, dataclasses, exceptions
-from ..common.functions import is_callsign
+from ..common import mixins, exceptions, functions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 from .callook import CallookClientAbc
 
 
@@ -19,27 +22,41 @@ class CallookSyncClient(mixins.SyncMixin, CallookClientAbc):
     """Synchronous Callook API client
 
     :param session: A requests session to use for requests
+    :param cache: A cache to answer searches from and store results in
+    :param response_cache: A persistent cache to store raw responses in and answer searches from
+    :param retry: A policy for retrying requests that fail with a connection or HTTP error
+    :param timeout: Timeouts for requests to the lookup source, and the default deadline for searches
+    :param transport: Connection pooling settings and shared sessions, used if no session is given
+    :param keep_raw_data: Keep the raw data in results. If ``False``, :attr:`CallsignData.raw_data`
+        is ``None``, saving memory in large caches
     """
-    def __init__(self, session: Optional[requests.Session] = None):
-        if session is None:
-            self._session = requests.Session()
-        else:
+    def __init__(self, session: Optional[requests.Session] = None, *,
+                 cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 keep_raw_data: bool = True):
+        if session is not None:
             self._session = session
-        super().__init__()
-
-    def search(self, callsign: str) -> dataclasses.CallsignData:
-        if not is_callsign(callsign):
-            raise exceptions.CallsignLookupError("Invalid Callsign")
-
-        return self._process_search(
-            query=callsign.upper(),
-            resp=self._do_query(
-                callsign=callsign.upper()
-            )
-        )
+        elif transport is not None:
+            self._session = transport.requests_session()
+        else:
+            self._session = requests.Session()
+            self._owns_session = True
+        super().__init__(cache=cache, response_cache=response_cache, retry=retry, timeout=timeout, transport=transport,
+                         keep_raw_data=keep_raw_data)
 
     def _do_query(self, **query) -> bytes:
-        with self._session.get(self._base_url.format(query["callsign"])) as resp:
-            if resp.status_code != 200:
-                raise exceptions.CallsignLookupError(f"Unable to connect to Callook (HTTP Error {resp.status_code})")
-            return resp.content
+        try:
+            with self._session.get(self._base_url.format(query["callsign"]), timeout=self._request_timeout()) as resp:
+                if resp.status_code != 200:
+                    raise exceptions.LookupHttpError(
+                        f"Unable to connect to Callook (HTTP Error {resp.status_code})", status=resp.status_code,
+                        retry_after=functions.parse_retry_after(resp.headers.get("Retry-After", None))
+                    )
+                return resp.content
+        except requests.Timeout as e:
+            raise exceptions.LookupTimeoutError(f"Timed out waiting for Callook ({e})") from e
+        except requests.RequestException as e:
+            raise exceptions.LookupConnectionError(f"Unable to connect to Callook ({e})") from e
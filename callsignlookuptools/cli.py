@@ -9,10 +9,11 @@ from sys import stderr
 from enum import Enum
 from dataclasses import asdict
 from datetime import datetime
+from pathlib import Path
 from typing import Callable, Optional
 
 from callsignlookuptools import QrzSyncClient, CallookSyncClient, HamQthSyncClient, QrzCqSyncClient
-from callsignlookuptools import CallsignData, CallsignLookupError, __info__
+from callsignlookuptools import CallsignData, CallsignLookupError, SqliteSessionStore, __info__
 from callsignlookuptools.common.enums import DataSource
 
 try:
@@ -78,20 +79,25 @@ def tabulate(data: CallsignData) -> str:
     return result.rstrip("\n")
 
 
-def run_query(source: DataSource, query: str, username: Optional[str] = None, password: Optional[str] = None):
+def run_query(source: DataSource, query: str, username: Optional[str] = None, password: Optional[str] = None,
+              session_store: Optional[Path] = None):
     """sets up and runs a callsign query, then prints the result"""
     lookup: Callable = lookup_classes[source]
 
     # non-auth sources
     if source in (DataSource.CALLOOK,):
-        lookup_obj = lookup()
+        lookup_obj = lookup(keep_raw_data=False)
     # auth sources
     else:
-        lookup_obj = lookup(username=username, password=password)
+        lookup_obj = lookup(username=username, password=password, optimistic=True, keep_raw_data=False,
+                            session_store=SqliteSessionStore(session_store) if session_store is not None else None)
 
     if query:
         call = query.upper()
         try:
+            # log in up front if there's no stored session key, so the search can go straight out with the new one
+            if source not in (DataSource.CALLOOK,) and not lookup_obj.session_key:
+                lookup_obj.warmup()
             result = lookup_obj.search(call)
             echo(style(source.value.capitalize(), fg=colors.CYAN, bold=True) + style(" data for ", fg=colors.CYAN) +
                  style(call, fg=colors.GREEN, bold=True) + style(":", fg=colors.CYAN))
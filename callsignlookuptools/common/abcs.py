@@ -7,16 +7,134 @@ Released under the terms of the BSD 3-Clause license.
 
 
 from abc import ABC, abstractmethod
+from typing import Callable, Optional
 
+from .cache import LookupCache, SqliteResponseCache
+from .circuit import CircuitBreaker
+from .ratelimit import RateLimiter, default_rate_limiter
+from .retry import RetryPolicy
+from .sessionstore import SqliteSessionStore
+from .timeout import Timeout
+from .transport import Transport
 from .dataclasses import CallsignData
+from .enums import DataSource
 
 
 class LookupAbc(ABC):
     """The base class for all lookup classes **This should not be used directly**."""
+    _base_url: str
+    _data_source: DataSource
+    _rate_limiter: RateLimiter = default_rate_limiter
+    _circuit_breaker: Optional[CircuitBreaker] = None
+    _transport: Optional[Transport]
+    _keep_raw_data: bool
+
     @abstractmethod
     def __init__(self):
         pass
 
+    @property
+    def data_source(self) -> DataSource:
+        """the lookup source this client queries"""
+        return self._data_source
+
+    @property
+    def cache(self) -> Optional[LookupCache]:
+        """
+        :getter: gets the cache searches are answered from, if any
+
+        :setter: sets the cache searches are answered from, or ``None`` to disable caching
+        """
+        return self._cache
+
+    @cache.setter
+    def cache(self, val: Optional[LookupCache]) -> None:
+        self._cache = val
+
+    @property
+    def response_cache(self) -> Optional[SqliteResponseCache]:
+        """
+        :getter: gets the persistent cache raw responses are stored in, if any
+
+        :setter: sets the persistent cache raw responses are stored in, or ``None`` to disable it
+        """
+        return self._response_cache
+
+    @response_cache.setter
+    def response_cache(self, val: Optional[SqliteResponseCache]) -> None:
+        self._response_cache = val
+
+    @property
+    def retry(self) -> Optional[RetryPolicy]:
+        """
+        :getter: gets the policy for retrying failed requests, if any
+
+        :setter: sets the policy for retrying failed requests, or ``None`` to disable retries
+        """
+        return self._retry
+
+    @retry.setter
+    def retry(self, val: Optional[RetryPolicy]) -> None:
+        self._retry = val
+
+    @property
+    def timeout(self) -> Timeout:
+        """
+        :getter: gets the timeouts for requests to the lookup source, and the default deadline for searches
+
+        :setter: sets the timeouts for requests to the lookup source, and the default deadline for searches
+        """
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, val: Timeout) -> None:
+        self._timeout = val
+
+    @property
+    def transport(self) -> Optional[Transport]:
+        """the transport the client's session is shared through, if any"""
+        return self._transport
+
+    @property
+    def keep_raw_data(self) -> bool:
+        """
+        :getter: gets whether results keep the raw data from the lookup source
+
+        :setter: sets whether results keep the raw data from the lookup source. If ``False``,
+            :attr:`CallsignData.raw_data` is ``None``.
+        """
+        return self._keep_raw_data
+
+    @keep_raw_data.setter
+    def keep_raw_data(self, val: bool) -> None:
+        self._keep_raw_data = val
+
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """
+        :getter: gets the rate limiter requests wait for. By default, this is shared by every client in the process.
+
+        :setter: sets the rate limiter requests wait for
+        """
+        return self._rate_limiter
+
+    @rate_limiter.setter
+    def rate_limiter(self, val: RateLimiter) -> None:
+        self._rate_limiter = val
+
+    @property
+    def circuit_breaker(self) -> Optional[CircuitBreaker]:
+        """
+        :getter: gets the circuit breaker that stops requests to a failing lookup source, if any
+
+        :setter: sets the circuit breaker that stops requests to a failing lookup source, or ``None`` to disable it
+        """
+        return self._circuit_breaker
+
+    @circuit_breaker.setter
+    def circuit_breaker(self, val: Optional[CircuitBreaker]) -> None:
+        self._circuit_breaker = val
+
     @property  # type: ignore[misc]
     @abstractmethod
     def session(self):
@@ -28,12 +146,15 @@ class LookupAbc(ABC):
         pass
 
     @abstractmethod
-    def search(self, callsign: str) -> CallsignData:
+    def search(self, callsign: str, deadline: Optional[float] = None) -> CallsignData:
         """Search for a callsign
 
         :param callsign: the callsign to look up
+        :param deadline: how long the whole search can take, including logging in and checking the session,
+            in seconds. Defaults to the client's ``timeout.total``.
         :return: the callsign data from the lookup service
-        :raises: :class:`common.exceptions.CallsignLookupError` on network or parsing error
+        :raises: :class:`common.exceptions.CallsignLookupError` on network or parsing error,
+            or :class:`common.exceptions.LookupTimeoutError` if the search runs out of time
         """
         pass
 
@@ -41,6 +162,20 @@ class LookupAbc(ABC):
     def _process_search(self, query: str, resp: bytes) -> CallsignData:
         pass
 
+    def _check_quota(self):
+        """Raise :class:`common.exceptions.QuotaExceededError` if no more searches should be sent to the
+        lookup source, or count the search about to be sent against the quota. Answers from the caches don't count.
+        Each search counted is followed by :meth:`_release_quota` once it has been answered or has failed."""
+        pass
+
+    def _release_quota(self):
+        """Stop counting a search counted by :meth:`_check_quota` as in flight"""
+        pass
+
+    def _record_usage(self, resp: bytes):
+        """Update the client's view of its quota from a response just received from the lookup source"""
+        pass
+
     @abstractmethod
     def _do_query(self, **query) -> bytes:
         pass
@@ -48,6 +183,15 @@ class LookupAbc(ABC):
 
 class AuthMixinAbc(ABC):
     """adds common properties for authenticated lookups"""
+    # provided by the lookup source ABC, which comes after the mixins in the MRO
+    _login_query: Callable[[], dict]
+    _session_query: Callable[[], dict]
+    #: how long a new session key stays valid, in seconds, or ``None`` if the lookup source doesn't say
+    _session_lifetime: Optional[float]
+    _session_issued: Optional[float]
+    _session_expires: Optional[float]
+    _session_store: Optional[SqliteSessionStore]
+
     @property
     def username(self) -> str:
         """
@@ -99,6 +243,44 @@ class AuthMixinAbc(ABC):
     @session_key.setter
     def session_key(self, val: str) -> None:
         self._session_key = val
+        self._session_issued = None
+        self._session_expires = None
+
+    @property
+    def session_issued(self) -> Optional[float]:
+        """when the client's session key was issued, as a Unix timestamp, or ``None`` if it didn't log in for it"""
+        return self._session_issued
+
+    @property
+    def session_expires(self) -> Optional[float]:
+        """when the client's session key is expected to expire, as a Unix timestamp, or ``None`` if unknown"""
+        return self._session_expires
+
+    @property
+    def session_store(self) -> Optional[SqliteSessionStore]:
+        """
+        :getter: gets the store the session key is shared through
+
+        :setter: sets the store the session key is shared through
+        """
+        return self._session_store
+
+    @session_store.setter
+    def session_store(self, val: Optional[SqliteSessionStore]) -> None:
+        self._session_store = val
+
+    @property
+    def optimistic(self) -> bool:
+        """
+        :getter: gets whether searches are sent without checking the session first
+
+        :setter: sets whether searches are sent without checking the session first
+        """
+        return self._optimistic
+
+    @optimistic.setter
+    def optimistic(self, val: bool) -> None:
+        self._optimistic = val
 
     @abstractmethod
     def _login(self, **query):
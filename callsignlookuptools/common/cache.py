@@ -0,0 +1,360 @@
+"""
+caches for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+import os
+import sqlite3
+from collections import OrderedDict
+from os import PathLike
+from threading import Lock
+from time import monotonic, time
+from typing import Optional, Union
+
+from .dataclasses import CallsignData
+from .enums import DataSource
+from .exceptions import CallsignNotFoundError
+
+
+class LookupCache:
+    """An in-memory cache of lookup results, with time-based expiry and least-recently-used eviction.
+
+    Callsigns the lookup service has no data for are remembered separately, usually for a shorter time.
+    Other errors, like network or server errors, are never cached.
+
+    One cache can be shared by any number of clients, sync or async, for any lookup source.
+    Cached :class:`CallsignData` objects are returned as-is to every caller, so they should not be modified.
+
+    :param ttl: how long results are kept, in seconds
+    :param maxsize: the maximum number of results kept
+    :param negative_ttl: how long callsigns that were not found are remembered, in seconds
+    :param negative_maxsize: the maximum number of callsigns that were not found remembered
+    :param max_stale: how long after expiring a result can still be returned by async clients while they refresh it
+        in the background, in seconds. ``0`` disables this.
+    """
+    def __init__(self, ttl: float = 3600, maxsize: int = 4096, negative_ttl: float = 300,
+                 negative_maxsize: int = 4096, max_stale: float = 0):
+        self._ttl = ttl
+        self._max_stale = max_stale
+        self._maxsize = maxsize
+        self._negative_ttl = negative_ttl
+        self._negative_maxsize = negative_maxsize
+        self._entries: OrderedDict[tuple[DataSource, str], tuple[float, CallsignData]] = OrderedDict()
+        self._not_found: OrderedDict[tuple[DataSource, str], tuple[float, str]] = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._negative_hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+
+    @property
+    def ttl(self) -> float:
+        """
+        :getter: gets how long results are kept, in seconds
+
+        :setter: sets how long results are kept, in seconds
+        """
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, val: float) -> None:
+        self._ttl = val
+
+    @property
+    def maxsize(self) -> int:
+        """
+        :getter: gets the maximum number of results kept
+
+        :setter: sets the maximum number of results kept
+        """
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, val: int) -> None:
+        with self._lock:
+            self._maxsize = val
+            self._evict()
+
+    @property
+    def max_stale(self) -> float:
+        """
+        :getter: gets how long after expiring a result can still be returned while it is refreshed, in seconds
+
+        :setter: sets how long after expiring a result can still be returned while it is refreshed, in seconds
+        """
+        return self._max_stale
+
+    @max_stale.setter
+    def max_stale(self, val: float) -> None:
+        self._max_stale = val
+
+    @property
+    def negative_ttl(self) -> float:
+        """
+        :getter: gets how long callsigns that were not found are remembered, in seconds
+
+        :setter: sets how long callsigns that were not found are remembered, in seconds
+        """
+        return self._negative_ttl
+
+    @negative_ttl.setter
+    def negative_ttl(self, val: float) -> None:
+        self._negative_ttl = val
+
+    @property
+    def negative_maxsize(self) -> int:
+        """
+        :getter: gets the maximum number of callsigns that were not found remembered
+
+        :setter: sets the maximum number of callsigns that were not found remembered
+        """
+        return self._negative_maxsize
+
+    @negative_maxsize.setter
+    def negative_maxsize(self, val: int) -> None:
+        with self._lock:
+            self._negative_maxsize = val
+            self._evict()
+
+    @property
+    def hits(self) -> int:
+        """the number of lookups answered with a result from the cache"""
+        return self._hits
+
+    @property
+    def negative_hits(self) -> int:
+        """the number of lookups answered from the cache with a callsign that was not found"""
+        return self._negative_hits
+
+    @property
+    def stale_hits(self) -> int:
+        """the number of lookups answered with an expired result while it was refreshed.
+        These are also counted as :attr:`misses`."""
+        return self._stale_hits
+
+    @property
+    def misses(self) -> int:
+        """the number of lookups not found in the cache, or found expired"""
+        return self._misses
+
+    def get(self, source: DataSource, callsign: str) -> Optional[CallsignData]:
+        """Get a cached result
+
+        :param source: the lookup source the result came from
+        :param callsign: the callsign searched for
+        :return: the cached result, or ``None`` if there is no unexpired result
+        :raises: :class:`common.exceptions.CallsignNotFoundError` if the callsign is remembered as not found
+        """
+        key = (source, callsign.strip().upper())
+        with self._lock:
+            now = monotonic()
+            entry = self._entries.get(key, None)
+            if entry is not None and now - entry[0] <= self._ttl:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            not_found = self._not_found.get(key, None)
+            if not_found is not None and now - not_found[0] <= self._negative_ttl:
+                self._negative_hits += 1
+                raise CallsignNotFoundError(not_found[1])
+            self._misses += 1
+            return None
+
+    def get_stale(self, source: DataSource, callsign: str) -> Optional[CallsignData]:
+        """Get a cached result that has expired, but by no more than :attr:`max_stale`
+
+        :param source: the lookup source the result came from
+        :param callsign: the callsign searched for
+        :return: the expired result, or ``None`` if there is none or it is too old
+        """
+        key = (source, callsign.strip().upper())
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None or monotonic() - entry[0] > self._ttl + self._max_stale:
+                return None
+            self._entries.move_to_end(key)
+            self._stale_hits += 1
+            return entry[1]
+
+    def put(self, source: DataSource, callsign: str, data: CallsignData) -> None:
+        """Add a result to the cache, evicting the least-recently-used results if it is full
+
+        :param source: the lookup source the result came from
+        :param callsign: the callsign searched for
+        :param data: the result
+        """
+        key = (source, callsign.strip().upper())
+        with self._lock:
+            self._not_found.pop(key, None)
+            self._entries[key] = (monotonic(), data)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def put_not_found(self, source: DataSource, callsign: str, error: CallsignNotFoundError) -> None:
+        """Remember that the lookup service has no data for a callsign
+
+        :param source: the lookup source that had no data
+        :param callsign: the callsign searched for
+        :param error: the error raised by the lookup
+        """
+        key = (source, callsign.strip().upper())
+        with self._lock:
+            self._entries.pop(key, None)
+            self._not_found[key] = (monotonic(), str(error))
+            self._not_found.move_to_end(key)
+            self._evict()
+
+    def clear(self) -> None:
+        """Remove everything from the cache and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._not_found.clear()
+            self._hits = 0
+            self._negative_hits = 0
+            self._stale_hits = 0
+            self._misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+        while len(self._not_found) > self._negative_maxsize:
+            self._not_found.popitem(last=False)
+
+
+class SqliteResponseCache:
+    """A persistent cache of raw lookup responses, stored in an SQLite database.
+
+    Cached responses are parsed again on every hit, so they benefit from any fixes to the parsers.
+    The database can be shared by several clients, threads, and processes at the same time.
+
+    :param path: the path of the database file. It will be created if it does not exist, readable and writable
+        only by its owner, as the responses in it include session keys.
+    :param ttl: how long responses are kept, in seconds
+    :param maxsize: the maximum number of responses kept. The oldest responses are removed first.
+        To keep writes fast, the cache is trimmed periodically, so it can briefly go a little over this size.
+    :param timeout: how long to wait for another process to release the database, in seconds
+    """
+    #: number of writes between trimming the cache to ``maxsize``
+    _trim_interval = 32
+
+    def __init__(self, path: Union[str, PathLike], ttl: float = 7 * 24 * 3600, maxsize: int = 100_000,
+                 timeout: float = 30):
+        # created before sqlite3 gets to it, which would use the umask, like SqliteSessionStore
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._ttl = ttl
+        self._maxsize = maxsize
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._puts = 0
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "source TEXT NOT NULL, callsign TEXT NOT NULL, fetched_at REAL NOT NULL, response BLOB NOT NULL, "
+                "PRIMARY KEY (source, callsign))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_fetched_at ON responses (fetched_at)")
+
+    @property
+    def ttl(self) -> float:
+        """
+        :getter: gets how long responses are kept, in seconds
+
+        :setter: sets how long responses are kept, in seconds
+        """
+        return self._ttl
+
+    @ttl.setter
+    def ttl(self, val: float) -> None:
+        self._ttl = val
+
+    @property
+    def maxsize(self) -> int:
+        """
+        :getter: gets the maximum number of responses kept
+
+        :setter: sets the maximum number of responses kept
+        """
+        return self._maxsize
+
+    @maxsize.setter
+    def maxsize(self, val: int) -> None:
+        self._maxsize = val
+
+    @property
+    def hits(self) -> int:
+        """the number of lookups answered from the cache by this object"""
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        """the number of lookups not found in the cache by this object, or found expired"""
+        return self._misses
+
+    def get(self, source: DataSource, callsign: str) -> Optional[bytes]:
+        """Get a cached response
+
+        :param source: the lookup source the response came from
+        :param callsign: the callsign searched for
+        :return: the raw response, or ``None`` if there is no unexpired response
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response FROM responses WHERE source = ? AND callsign = ? AND fetched_at >= ?",
+                (source.value, callsign.strip().upper(), time() - self._ttl)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return row[0]
+
+    def put(self, source: DataSource, callsign: str, resp: bytes) -> None:
+        """Add a response to the cache, removing expired responses and the oldest responses if it is full
+
+        :param source: the lookup source the response came from
+        :param callsign: the callsign searched for
+        :param resp: the raw response
+        """
+        now = time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                                 (source.value, callsign.strip().upper(), now, resp))
+                self._db.execute("DELETE FROM responses WHERE fetched_at < ?", (now - self._ttl,))
+                # trimming to size walks the whole index, so it is only done every so often
+                self._puts += 1
+                if self._puts % self._trim_interval == 0:
+                    self._db.execute(
+                        "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY fetched_at DESC "
+                        "LIMIT -1 OFFSET ?)", (self._maxsize,)
+                    )
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def clear(self) -> None:
+        """Remove all responses from the cache and reset the hit and miss counters"""
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._hits = 0
+            self._misses = 0
+
+    def close(self) -> None:
+        """Close the database. The cache can't be used after this."""
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
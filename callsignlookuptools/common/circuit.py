@@ -0,0 +1,114 @@
+"""
+circuit breaker for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+from threading import Lock
+from time import monotonic
+from typing import Optional
+
+from .enums import CircuitState, DataSource
+from .exceptions import CallsignLookupError, CircuitOpenError, LookupConnectionError, LookupHttpError
+
+
+class _Circuit:
+    """The circuit state for one lookup source"""
+    def __init__(self) -> None:
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_at: Optional[float] = None
+
+
+class CircuitBreaker:
+    """Stops sending requests to a lookup source that keeps failing, so lookups fail immediately
+    instead of each waiting for a broken service.
+
+    After :attr:`failure_threshold` consecutive connection failures or server errors, the circuit for that source
+    opens, and requests to it raise :class:`common.exceptions.CircuitOpenError` without being sent.
+    Once :attr:`cooldown` has passed, the circuit is half-open: a single trial request is let through,
+    and the circuit closes again if it succeeds, or reopens for another cool-down if it fails.
+
+    Each lookup source has its own circuit, so one breaker can be shared by clients for every source,
+    from any thread or event loop.
+
+    :param failure_threshold: the number of consecutive failures that opens the circuit
+    :param cooldown: how long the circuit stays open before a trial request is allowed, in seconds
+    :param failure_statuses: the HTTP status codes that count as failures
+    """
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0,
+                 failure_statuses: frozenset[int] = frozenset({500, 502, 503, 504})):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failure_statuses = failure_statuses
+        self._circuits: dict[DataSource, _Circuit] = {}
+        self._lock = Lock()
+
+    def state(self, source: DataSource) -> CircuitState:
+        """Get the state of the circuit for a lookup source
+
+        :param source: the lookup source
+        """
+        with self._lock:
+            return self._state(self._circuits.get(source, None), monotonic())
+
+    def before_request(self, source: DataSource) -> None:
+        """Check that a request can be sent to a lookup source
+
+        :param source: the lookup source
+        :raises: :class:`common.exceptions.CircuitOpenError` if the circuit is open, or if it is half-open and the
+            trial request is already running
+        """
+        with self._lock:
+            circuit = self._circuits.get(source, None)
+            if circuit is None or circuit.opened_at is None:
+                return
+            now = monotonic()
+            # a trial that never reported back (e.g. it was cancelled) is given up on after another cool-down
+            trial_running = circuit.trial_at is not None and now - circuit.trial_at <= self.cooldown
+            if now - circuit.opened_at >= self.cooldown and not trial_running:
+                circuit.trial_at = now
+                return
+            remaining = max(0.0, circuit.opened_at + self.cooldown - now)
+            raise CircuitOpenError(f"{source.value} is failing, not sending requests for {remaining:.0f}s")
+
+    def record(self, source: DataSource, error: Optional[CallsignLookupError] = None) -> None:
+        """Record the outcome of a request to a lookup source
+
+        :param source: the lookup source
+        :param error: the error the request failed with, if any
+        """
+        failed = isinstance(error, LookupConnectionError) or (isinstance(error, LookupHttpError)
+                                                              and error.status in self.failure_statuses)
+        with self._lock:
+            circuit = self._circuits.get(source, None)
+            if not failed:
+                if circuit is not None:
+                    del self._circuits[source]
+                return
+            if circuit is None:
+                circuit = self._circuits[source] = _Circuit()
+            circuit.failures += 1
+            if circuit.failures >= self.failure_threshold:
+                circuit.opened_at = monotonic()
+                circuit.trial_at = None
+
+    def reset(self, source: Optional[DataSource] = None) -> None:
+        """Close the circuit for a lookup source, or for every source
+
+        :param source: the lookup source, or ``None`` for every source
+        """
+        with self._lock:
+            if source is None:
+                self._circuits.clear()
+            else:
+                self._circuits.pop(source, None)
+
+    def _state(self, circuit: Optional[_Circuit], now: float) -> CircuitState:
+        if circuit is None or circuit.opened_at is None:
+            return CircuitState.CLOSED
+        if now - circuit.opened_at < self.cooldown:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
@@ -0,0 +1,77 @@
+"""
+adaptive concurrency for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+from math import inf
+from time import monotonic
+from typing import Optional
+
+from .exceptions import CallsignLookupError, LookupConnectionError, LookupHttpError
+
+
+class AdaptiveConcurrency:
+    """A concurrency limit for batch lookups that adapts to how the lookup source is coping,
+    using additive increase and multiplicative decrease (AIMD).
+
+    The limit grows by :attr:`increase` for every window of successful requests, and is multiplied by
+    :attr:`decrease` when a request fails because the source is overloaded or takes much longer than usual.
+    It is only decreased once for all the requests that were already running when it was last decreased.
+
+    :param initial: the limit to start at
+    :param min_limit: the lowest the limit can go
+    :param max_limit: the highest the limit can go
+    :param increase: how much the limit grows for each full window of successful requests
+    :param decrease: the factor the limit is multiplied by when the source is overloaded
+    :param latency_tolerance: how many times slower than the average a response can be before it counts as overload
+    :param overload_statuses: the HTTP status codes that mean the source is overloaded
+    """
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 64, increase: float = 1.0,
+                 decrease: float = 0.5, latency_tolerance: float = 3.0,
+                 overload_statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})):
+        self._limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.overload_statuses = overload_statuses
+        self._latency: Optional[float] = None
+        self._last_decrease = -inf
+
+    @property
+    def limit(self) -> int:
+        """the current number of lookups allowed to run at the same time"""
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def latency(self) -> Optional[float]:
+        """the moving average of response times, in seconds, or ``None`` if there have been no responses yet"""
+        return self._latency
+
+    def record(self, started: float, error: Optional[CallsignLookupError] = None) -> None:
+        """Record the outcome of a request
+
+        :param started: when the request was sent, from :func:`time.monotonic`
+        :param error: the error the request failed with, if any
+        """
+        now = monotonic()
+        elapsed = now - started
+        slow = self._latency is not None and elapsed > self._latency * self.latency_tolerance
+        if error is None:
+            self._latency = elapsed if self._latency is None else 0.9 * self._latency + 0.1 * elapsed
+
+        if slow or self._is_overload(error):
+            if started >= self._last_decrease:
+                self._limit = max(self.min_limit, self._limit * self.decrease)
+                self._last_decrease = now
+        elif error is None:
+            self._limit = min(self.max_limit, self._limit + self.increase / self._limit)
+
+    def _is_overload(self, error: Optional[CallsignLookupError]) -> bool:
+        if isinstance(error, LookupConnectionError):
+            return True
+        return isinstance(error, LookupHttpError) and error.status in self.overload_statuses
@@ -6,8 +6,8 @@ Released under the terms of the BSD 3-Clause license.
 """
 
 
-from dataclasses import dataclass
-from typing import Union, Optional
+from dataclasses import dataclass, field
+from typing import Any, Callable, Union, Optional
 from datetime import datetime
 
 from pydantic import BaseModel
@@ -218,13 +218,52 @@ class Timezone:
     observes_dst: Optional[bool] = None
 
 
+class LazyRawData:
+    """Stands in for :attr:`CallsignData.raw_data` until it is first read, then is replaced by ``func(*args)``.
+
+    ``func`` and ``args`` should be picklable, like a module-level function and the raw response,
+    so that :class:`CallsignData` stays picklable.
+
+    :param func: the function that parses the raw data
+    :param args: the arguments to call ``func`` with
+    """
+    __slots__ = ("func", "args")
+
+    def __init__(self, func: Callable[..., Optional[BaseModel]], *args: Any):
+        self.func = func
+        self.args = args
+
+    def load(self) -> Optional[BaseModel]:
+        return self.func(*self.args)
+
+
+class _RawDataField:
+    """The descriptor behind :attr:`CallsignData.raw_data`, which loads a :class:`LazyRawData` the first time the
+    field is read"""
+    def __init__(self, name: str):
+        self._name = name
+
+    def __get__(self, obj: Any, objtype: Optional[type] = None) -> Optional[BaseModel]:
+        if obj is None:
+            raise AttributeError(self._name)
+        value = obj.__dict__[self._name]
+        if isinstance(value, LazyRawData):
+            value = obj.__dict__[self._name] = value.load()
+        return value
+
+    def __set__(self, obj: Any, value: Union[BaseModel, LazyRawData, None]) -> None:
+        obj.__dict__[self._name] = value
+
+
 @dataclass
 class CallsignData:
     """Represents the data for a callsign retrieved from a lookup service"""
     #: the callsign searched for
     query: str
     #: the raw data, as parsed by pydantic from the API response. Probably not needed for most use cases.
-    raw_data: BaseModel
+    #: It is only parsed the first time it is read, and is ``None`` if the client was created with
+    #: ``keep_raw_data=False``.
+    raw_data: Optional[BaseModel]
     #: the lookup service the data comes from
     data_source: DataSource
     #: the type of license the callsign is associated with
@@ -321,3 +360,17 @@ class CallsignData:
     uls_url: Optional[str] = None
     #: FRN (USA only)
     frn: Optional[str] = None
+
+
+# installed after the dataclass is built, so the descriptor isn't taken as the field's default
+CallsignData.raw_data = _RawDataField("raw_data")  # type: ignore[assignment]
+
+
+@dataclass
+class MergedCallsignData(CallsignData):
+    """Represents the data for a callsign combined from several lookup services.
+    ``raw_data`` and ``data_source`` are those of the highest-precedence service that had data."""
+    #: the lookup service each field was taken from
+    field_sources: dict[str, DataSource] = field(default_factory=dict)
+    #: the data from each lookup service that had data
+    results: dict[DataSource, CallsignData] = field(default_factory=dict)
@@ -75,3 +75,10 @@ class CallookStatus(Enum):
     VALID = "VALID"
     INVALID = "INVALID"
     UPDATING = "UPDATING"
+
+
+class CircuitState(Enum):
+    """Describes the state of a circuit breaker for a lookup source"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
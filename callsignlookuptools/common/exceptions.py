@@ -6,7 +6,60 @@ Released under the terms of the BSD 3-Clause license.
 """
 
 
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from .enums import DataSource
+
+
 class CallsignLookupError(Exception):
     """The exception raised when something goes wrong in callsignlookuptools"""
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
+
+
+class CallsignNotFoundError(CallsignLookupError):
+    """The exception raised when the lookup service has no data for a callsign"""
+
+
+class LookupConnectionError(CallsignLookupError):
+    """The exception raised when the lookup service can't be reached, or the connection fails"""
+
+
+class LookupTimeoutError(LookupConnectionError):
+    """The exception raised when the lookup service takes too long to answer, or a search runs out of time"""
+
+
+class LookupHttpError(CallsignLookupError):
+    """The exception raised when the lookup service responds with an HTTP error
+
+    :param status: the HTTP status code of the response
+    :param retry_after: how long the lookup service asked to wait before retrying, in seconds
+    """
+    def __init__(self, *args: object, status: int, retry_after: Optional[float] = None) -> None:
+        super().__init__(*args)
+        #: the HTTP status code of the response
+        self.status = status
+        #: how long the lookup service asked to wait before retrying, in seconds, if it did
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(CallsignLookupError):
+    """The exception raised without sending a request when a lookup service has been failing,
+    until its circuit breaker's cool-down is over"""
+
+
+class QuotaExceededError(CallsignLookupError):
+    """The exception raised without sending a request when a client has used up its lookup budget"""
+
+
+class AllSourcesFailedError(CallsignLookupError):
+    """The exception raised when a multi-source lookup fails on every source, and not every source
+    reported the callsign as not found
+
+    :param errors: the error raised by each source
+    """
+    def __init__(self, *args: object, errors: "dict[DataSource, CallsignLookupError]") -> None:
+        super().__init__(*args)
+        #: the error raised by each source
+        self.errors = errors
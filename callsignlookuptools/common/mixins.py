@@ -6,46 +6,125 @@ Released under the terms of the BSD 3-Clause license.
 """
 
 
+from abc import abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextvars import ContextVar
 from importlib.util import find_spec
-from typing import Optional
+from threading import Lock
+from time import monotonic, sleep, time
+from typing import AsyncIterator, Iterable, Optional, Tuple, Union
+from urllib.parse import urlsplit
 
 if find_spec("requests"):
     import requests
+    from requests.adapters import HTTPAdapter
 if find_spec("aiohttp"):
+    import asyncio
     import aiohttp
 
-from .abcs import AuthMixinAbc
-from .exceptions import CallsignLookupError
-from .functions import xml2dict
+from .abcs import AuthMixinAbc, LookupAbc
+from .concurrency import AdaptiveConcurrency
+from .dataclasses import CallsignData
+from .exceptions import CallsignLookupError, CallsignNotFoundError, LookupTimeoutError
+from .functions import xml2dict, xml_sections, is_callsign
+
+
+#: when the search running in the current thread has to finish, from :func:`time.monotonic`
+_search_deadline: ContextVar[Optional[float]] = ContextVar("search_deadline", default=None)
+
+
+def _time_left() -> Optional[float]:
+    """Get how long the current search has left, in seconds, or ``None`` if it has no deadline"""
+    deadline = _search_deadline.get()
+    return None if deadline is None else deadline - monotonic()
+
+
+def _check_deadline():
+    """Raise :class:`LookupTimeoutError` if the current search is out of time"""
+    left = _time_left()
+    if left is not None and left <= 0:
+        raise LookupTimeoutError("Search deadline exceeded")
+
+
+class XmlAuthMixin(AuthMixinAbc):
+    #: lowercase substrings of a ``Session/Error`` message that mean the session key must be renewed
+    _session_error_markers = ("session", "expired")
+
+    def __init__(self, *args, **kwargs):
+        self._session_issued = None
+        self._session_expires = None
+        super().__init__(*args, **kwargs)
+        if not self._session_key and self._session_store is not None:
+            self._adopt_stored_session(self._session_store.get(self._data_source, self._username), "")
+
+    def _process_login(self, resp: bytes):
+        data = xml2dict(resp).get("session", None)
+        if not data:
+            raise CallsignLookupError("Login Failed")
+        if "error" in data:
+            raise CallsignLookupError(f"Login Failed: {data['error']}")
+        if "key" in data:
+            self._session_key = data["key"]
+        elif "session_id" in data:
+            self._session_key = data["session_id"]
+        self._session_issued = time()
+        self._session_expires = (None if self._session_lifetime is None
+                                 else self._session_issued + self._session_lifetime)
+
+    def _adopt_stored_session(self, stored: Optional[Tuple[str, Optional[float], Optional[float]]],
+                              stale_key: str) -> bool:
+        """Switch to a session key from the session store, unless it is ``stale_key``"""
+        if stored is None or stored[0] == stale_key:
+            return False
+        self._session_key, self._session_issued, self._session_expires = stored
+        return True
+
+    def _store_session(self):
+        self._session_store.put(self._data_source, self._username, self._session_key,
+                                self._session_issued, self._session_expires)
+
+    def _session_expired(self) -> bool:
+        """Check if the session key is known to have expired, so it can be replaced without trying it first"""
+        return self._session_expires is not None and time() >= self._session_expires
+
+    def _process_check_session(self, resp: bytes):
+        data = xml2dict(resp).get("session", None)
+        if not data:
+            raise CallsignLookupError("Invalid Session")
+        if "error" in data:
+            raise CallsignLookupError(data["error"])
+
+    def _is_session_error(self, resp: bytes, callsign: str = "") -> bool:
+        """Check if a search response was rejected because the session key is missing, invalid, or expired
+
+        :param resp: the search response
+        :param callsign: the callsign searched for, which errors like "Not found: ..." quote
+        """
+        # most responses have no error at all, and can be let through without parsing them
+        if b"rror>" not in resp:
+            return False
+        error = xml_sections(resp, to_lower=True).get("session", {}).get("error", None)
+        if error is None:
+            return False
+        error = error.lower()
+        # a quoted callsign like W1SESSION must not look like a session error
+        if callsign:
+            error = error.replace(callsign.lower(), "")
+        return any(marker in error for marker in self._session_error_markers)
 
 
 if find_spec("requests"):
-    class SyncXmlAuthMixin(AuthMixinAbc):
-        def _login(self, **query):
-            self._process_login(self._do_query(**query))
+    class SyncMixin(LookupAbc):
+        _inflight: dict[str, Future]
+        #: whether the client created its session, rather than being given it or sharing it through a transport
+        _owns_session = False
+
+        def __init__(self, *args, **kwargs):
+            self._pool_lock = Lock()
+            self._inflight = {}
+            self._inflight_lock = Lock()
+            super().__init__(*args, **kwargs)
 
-        def _check_session(self, **query):
-            self._process_check_session(self._do_query(**query))
-
-        def _process_login(self, resp: bytes):
-            data = xml2dict(resp).get("session", None)
-            if not data:
-                raise CallsignLookupError("Login Failed")
-            if "error" in data:
-                raise CallsignLookupError(f"Login Failed: {data['error']}")
-            if "key" in data:
-                self._session_key = data["key"]
-            elif "session_id" in data:
-                self._session_key = data["session_id"]
-
-        def _process_check_session(self, resp: bytes):
-            data = xml2dict(resp).get("session", None)
-            if not data:
-                raise CallsignLookupError("Invalid Session")
-            if "error" in data:
-                raise CallsignLookupError(data["error"])
-
-    class SyncMixin:
         @property
         def session(self) -> requests.Session:
             """
@@ -58,35 +137,242 @@ if find_spec("requests"):
         @session.setter
         def session(self, val: requests.Session):
             self._session = val
+            self._owns_session = False
+
+        def search(self, callsign: str, deadline: Optional[float] = None) -> CallsignData:
+            if not is_callsign(callsign):
+                raise CallsignLookupError("Invalid Callsign")
+            query = callsign.upper()
+            if self._cache is not None:
+                cached = self._cache.get(self._data_source, query)
+                if cached is not None:
+                    return cached
+            if deadline is None:
+                deadline = self._timeout.total
+            token = _search_deadline.set(None if deadline is None else monotonic() + deadline)
+            try:
+                return self._lookup_once(query)
+            finally:
+                _search_deadline.reset(token)
+
+        def search_many(self, callsigns: Iterable[str],
+                        concurrency: int = 8) -> list[tuple[str, Union[CallsignData, CallsignLookupError]]]:
+            """Search for many callsigns using a pool of worker threads
+
+            :param callsigns: the callsigns to look up
+            :param concurrency: the number of lookups to run at the same time
+            :return: ``(callsign, result)`` pairs in the same order as ``callsigns``, where ``result`` is either
+                the callsign data or the :class:`common.exceptions.CallsignLookupError` raised by that lookup
+            """
+            self._grow_pool(concurrency)
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                return list(executor.map(self._search_result, callsigns))
+
+        def _search_result(self, callsign: str) -> tuple[str, Union[CallsignData, CallsignLookupError]]:
+            try:
+                return callsign, self.search(callsign)
+            except CallsignLookupError as e:
+                return callsign, e
+
+        def _lookup_once(self, callsign: str) -> CallsignData:
+            """Look up a callsign, sharing the result with any other threads looking up the same callsign"""
+            with self._inflight_lock:
+                future = self._inflight.get(callsign, None)
+                leader = future is None
+                if future is None:
+                    future = self._inflight[callsign] = Future()
+            if not leader:
+                try:
+                    return future.result(timeout=_time_left())
+                # not the builtin TimeoutError before Python 3.11
+                except FutureTimeoutError as e:
+                    raise LookupTimeoutError("Search deadline exceeded") from e
+
+            try:
+                data = self._lookup(callsign)
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(data)
+                return data
+            finally:
+                with self._inflight_lock:
+                    del self._inflight[callsign]
+
+        def _lookup(self, callsign: str) -> CallsignData:
+            try:
+                data = self._fetch(callsign)
+            except CallsignNotFoundError as e:
+                if self._cache is not None:
+                    self._cache.put_not_found(self._data_source, callsign, e)
+                raise
+            if self._cache is not None:
+                self._cache.put(self._data_source, callsign, data)
+            return data
+
+        def _fetch(self, callsign: str) -> CallsignData:
+            if self._response_cache is not None:
+                cached = self._response_cache.get(self._data_source, callsign)
+                if cached is not None:
+                    return self._process_search(query=callsign, resp=cached)
+
+            self._check_quota()
+            try:
+                resp = self._do_search(callsign)
+            finally:
+                self._release_quota()
+            data = self._process_search(query=callsign, resp=resp)
+            if self._response_cache is not None:
+                self._response_cache.put(self._data_source, callsign, resp)
+            return data
+
+        def _grow_pool(self, size: int):
+            """Make sure the session can keep ``size`` connections to the lookup source open at once.
+
+            Only sessions the client created are changed. A session given to the client, or shared through its
+            transport, may be in use elsewhere and is left as it was set up.
+            """
+            if not self._owns_session:
+                return
+            url = urlsplit(self._base_url)
+            prefix = f"{url.scheme}://{url.netloc}/"
+            with self._pool_lock:
+                adapter = self._session.get_adapter(prefix)
+                if type(adapter) is not HTTPAdapter or adapter._pool_maxsize >= size:  # type: ignore[attr-defined]
+                    return
+                self._session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=size,
+                                                        max_retries=adapter.max_retries,
+                                                        pool_block=adapter._pool_block))  # type: ignore[attr-defined]
+
+        def _do_search(self, callsign: str) -> bytes:
+            return self._request(callsign=callsign)
+
+        def _request(self, **query) -> bytes:
+            """Send a query to the lookup source, subject to the circuit breaker, rate limiter, and retry policy"""
+            attempt = 1
+            while True:
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.before_request(self._data_source)
+                _check_deadline()
+                # wait for the rate limiter no longer than the search has left
+                wait = self._rate_limiter.reserve(self._data_source)
+                left = _time_left()
+                if wait > 0:
+                    sleep(wait if left is None else min(wait, max(left, 0)))
+                _check_deadline()
+                try:
+                    resp = self._do_query(**query)
+                except CallsignLookupError as e:
+                    self._record(e)
+                    delay = self._retry.next_delay(attempt, e) if self._retry is not None else None
+                    left = _time_left()
+                    if delay is None or (left is not None and delay >= left):
+                        raise
+                else:
+                    self._record()
+                    self._record_usage(resp)
+                    return resp
+                sleep(delay)
+                attempt += 1
+
+        def _record(self, error: Optional[CallsignLookupError] = None):
+            """Report the outcome of a request to the circuit breaker"""
+            if self._circuit_breaker is not None:
+                self._circuit_breaker.record(self._data_source, error)
+
+        def _request_timeout(self) -> Tuple[Optional[float], Optional[float]]:
+            """Get the connect and read timeouts for a request, shortened to fit the current search's deadline"""
+            left = _time_left()
+            if left is None:
+                return self._timeout.connect, self._timeout.read
+            left = max(left, 0.001)
+            return (left if self._timeout.connect is None else min(self._timeout.connect, left),
+                    left if self._timeout.read is None else min(self._timeout.read, left))
+
+    class SyncXmlAuthMixin(XmlAuthMixin, SyncMixin):
+        def __init__(self, *args, **kwargs):
+            self._login_lock = Lock()
+            super().__init__(*args, **kwargs)
+
+        def _login(self, **query):
+            self._process_login(self._request(**query))
+            if self._session_store is not None:
+                self._store_session()
+
+        def _check_session(self, **query):
+            self._process_check_session(self._request(**query))
+
+        def warmup(self, connections: int = 1):
+            """Log in and open connections to the lookup source ahead of time, so the first searches don't have to.
+            An existing session key is checked, and only replaced if it is no longer valid.
+
+            :param connections: the number of connections to open and keep in the session's pool
+            """
+            key = self._session_key
+            try:
+                if not key:
+                    raise CallsignLookupError("No session key")
+                self._check_session(**self._session_query())
+            except CallsignLookupError:
+                self._relogin(key)
+            if connections > 1:
+                self._grow_pool(connections)
+                with ThreadPoolExecutor(max_workers=connections) as executor:
+                    list(executor.map(lambda _: self._check_session(**self._session_query()), range(connections)))
+
+        def _relogin(self, stale_key: str):
+            """Log in again, unless another thread already replaced ``stale_key``"""
+            left = _time_left()
+            if not self._login_lock.acquire(timeout=-1 if left is None else max(left, 0)):
+                raise LookupTimeoutError("Search deadline exceeded while waiting for login")
+            try:
+                if self._session_key != stale_key:
+                    return
+                # another process sharing the session store may already have logged in
+                if (self._session_store is not None and
+                        self._adopt_stored_session(self._session_store.get(self._data_source, self._username),
+                                                   stale_key)):
+                    return
+                self._login(**self._login_query())
+            finally:
+                self._login_lock.release()
+
+        def _do_search(self, callsign: str) -> bytes:
+            if not self._optimistic:
+                key = self._session_key
+                try:
+                    self._check_session(**self._session_query())
+                except CallsignLookupError:
+                    self._relogin(key)
+                return self._request(**self._session_query(), callsign=callsign)
+
+            if not self._session_key or self._session_expired():
+                self._relogin(self._session_key)
+            key = self._session_key
+            resp = self._request(**self._session_query(), callsign=callsign)
+            if self._is_session_error(resp, callsign):
+                self._relogin(key)
+                resp = self._request(**self._session_query(), callsign=callsign)
+            return resp
 
 
 if find_spec("aiohttp"):
-    class AsyncXmlAuthMixin(AuthMixinAbc):
-        async def _login(self, **query):
-            self._process_login(await self._do_query(**query))
+    class AsyncMixin(LookupAbc):
+        _inflight: dict[str, asyncio.Future]
+        #: the number of searches waiting for each in-flight lookup
+        _inflight_waiters: dict[asyncio.Future, int]
+        _refreshes: set[asyncio.Future]
+        _concurrency_limiter: Optional[AdaptiveConcurrency]
+
+        def __init__(self, *args, **kwargs):
+            self._inflight = {}
+            self._inflight_waiters = {}
+            self._refreshes = set()
+            self._max_refreshes = 4
+            self._concurrency_limiter = None
+            super().__init__(*args, **kwargs)
 
-        async def _check_session(self, **query):
-            self._process_check_session(await self._do_query(**query))
-
-        def _process_login(self, resp: bytes):
-            data = xml2dict(resp).get("session", None)
-            if not data:
-                raise CallsignLookupError("Login Failed")
-            if "error" in data:
-                raise CallsignLookupError(f"Login Failed: {data['error']}")
-            if "key" in data:
-                self._session_key = data["key"]
-            elif "session_id" in data:
-                self._session_key = data["session_id"]
-
-        def _process_check_session(self, resp: bytes):
-            data = xml2dict(resp).get("session", None)
-            if not data:
-                raise CallsignLookupError("Invalid Session")
-            if "error" in data:
-                raise CallsignLookupError(data["error"])
-
-    class AsyncMixin:
         @property
         def session(self) -> Optional[aiohttp.ClientSession]:
             """
@@ -100,10 +386,377 @@ if find_spec("aiohttp"):
         def session(self, val: Optional[aiohttp.ClientSession]):
             self._session = val
 
+        @property
+        def max_refreshes(self) -> int:
+            """The maximum number of expired cache entries refreshed in the background at the same time.
+            Only used if the cache allows returning expired results (see :attr:`LookupCache.max_stale`).
+
+            :getter: gets the maximum number of background refreshes
+
+            :setter: sets the maximum number of background refreshes
+            """
+            return self._max_refreshes
+
+        @max_refreshes.setter
+        def max_refreshes(self, val: int):
+            self._max_refreshes = val
+
+        @property
+        def concurrency_limiter(self) -> Optional[AdaptiveConcurrency]:
+            """An adaptive limit on the number of lookups :meth:`search_stream` and :meth:`search_many` run at once.
+            It is fed the response times and errors of every request this client sends.
+
+            :getter: gets the adaptive concurrency limiter, if any
+
+            :setter: sets the adaptive concurrency limiter, or ``None`` to always use the ``concurrency`` given
+            """
+            return self._concurrency_limiter
+
+        @concurrency_limiter.setter
+        def concurrency_limiter(self, val: Optional[AdaptiveConcurrency]):
+            self._concurrency_limiter = val
+
         async def start_session(self):
-            """Creates a new ``aiohttp.ClientSession``"""
-            self._session = aiohttp.ClientSession()
+            """Creates a new ``aiohttp.ClientSession``, or uses the transport's shared session if the client has one"""
+            if self._transport is not None:
+                self._session = await self._transport.aiohttp_session()
+            else:
+                self._session = aiohttp.ClientSession()
 
         async def close_session(self):
-            """Closes the ``aiohttp.ClientSession`` session"""
+            """Closes the ``aiohttp.ClientSession`` session. A session shared through the client's transport is left
+            open for the other clients using it; close it with :meth:`Transport.aclose` instead."""
+            if self._transport is not None and self._transport.shares(self._session):
+                return
             await self._session.close()
+
+        async def search(self, callsign: str,  # type: ignore[override]
+                         deadline: Optional[float] = None) -> CallsignData:
+            if not is_callsign(callsign):
+                raise CallsignLookupError("Invalid Callsign")
+            query = callsign.upper()
+            if self._cache is not None:
+                cached = self._cache.get(self._data_source, query)
+                if cached is not None:
+                    return cached
+                cached = self._cache.get_stale(self._data_source, query)
+                if cached is not None:
+                    self._refresh(query)
+                    return cached
+            if deadline is None:
+                deadline = self._timeout.total
+            if deadline is None:
+                return await self._lookup_once(query)
+            try:
+                # the lookup itself is shielded, so it carries on for any other searches waiting for it
+                return await asyncio.wait_for(self._lookup_once(query), deadline)
+            except asyncio.TimeoutError as e:
+                raise LookupTimeoutError(f"Search deadline exceeded ({deadline}s)") from e
+
+        async def search_stream(self, callsigns: Iterable[str], concurrency: int = 8,
+                                ordered: bool = False
+                                ) -> AsyncIterator[tuple[str, Union[CallsignData, CallsignLookupError]]]:
+            """Search for many callsigns, running at most ``concurrency`` lookups at the same time
+
+            Callsigns are taken from ``callsigns`` only as lookups finish, so it can be a large or lazy iterable.
+
+            :param callsigns: the callsigns to look up
+            :param concurrency: the maximum number of lookups to run at the same time. If the client has a
+                :attr:`concurrency_limiter`, its current limit is used instead, up to this maximum.
+            :param ordered: yield results in the same order as ``callsigns`` instead of as they complete.
+                Lookups that finish early are held until all the results before them are yielded,
+                and count towards ``concurrency`` until then.
+            :return: an async iterator of ``(callsign, result)`` pairs, where ``result`` is either
+                the callsign data or the :class:`common.exceptions.CallsignLookupError` raised by that lookup
+            """
+            remaining = enumerate(callsigns)
+            pending: dict[asyncio.Task, int] = {}
+            finished: dict[int, tuple[str, Union[CallsignData, CallsignLookupError]]] = {}
+            next_idx = 0
+            try:
+                while True:
+                    window = concurrency
+                    if self._concurrency_limiter is not None:
+                        window = min(concurrency, self._concurrency_limiter.limit)
+                    while len(pending) + len(finished) < window:
+                        try:
+                            idx, callsign = next(remaining)
+                        except StopIteration:
+                            break
+                        pending[asyncio.ensure_future(self._search_result(callsign))] = idx
+                    if not pending:
+                        break
+
+                    done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        idx = pending.pop(task)
+                        if ordered:
+                            finished[idx] = task.result()
+                        else:
+                            yield task.result()
+                    while next_idx in finished:
+                        yield finished.pop(next_idx)
+                        next_idx += 1
+            finally:
+                for task in pending:
+                    task.cancel()
+
+        async def search_many(self, callsigns: Iterable[str],
+                              concurrency: int = 8) -> list[tuple[str, Union[CallsignData, CallsignLookupError]]]:
+            """Search for many callsigns, running at most ``concurrency`` lookups at the same time
+
+            :param callsigns: the callsigns to look up
+            :param concurrency: the maximum number of lookups to run at the same time. If the client has a
+                :attr:`concurrency_limiter`, its current limit is used instead, up to this maximum.
+            :return: ``(callsign, result)`` pairs in the same order as ``callsigns``, where ``result`` is either
+                the callsign data or the :class:`common.exceptions.CallsignLookupError` raised by that lookup
+            """
+            return [r async for r in self.search_stream(callsigns, concurrency, ordered=True)]
+
+        async def _search_result(self, callsign: str) -> tuple[str, Union[CallsignData, CallsignLookupError]]:
+            try:
+                return callsign, await self.search(callsign)
+            except CallsignLookupError as e:
+                return callsign, e
+
+        async def _lookup_once(self, callsign: str) -> CallsignData:
+            """Look up a callsign, sharing the result with any other coroutines looking up the same callsign.
+            The lookup is cancelled once every search waiting for it has been cancelled."""
+            task = self._inflight.get(callsign, None)
+            if task is None:
+                task = self._inflight[callsign] = asyncio.ensure_future(self._lookup(callsign))
+                task.add_done_callback(lambda t: self._forget_inflight(callsign, t))
+            self._inflight_waiters[task] = self._inflight_waiters.get(task, 0) + 1
+            try:
+                # shielded so that one cancelled search doesn't cancel the lookup for everyone else
+                return await asyncio.shield(task)
+            finally:
+                waiters = self._inflight_waiters.pop(task) - 1
+                if waiters:
+                    self._inflight_waiters[task] = waiters
+                elif not task.done():
+                    # nobody wants the result any more, so stop spending requests and quota on it
+                    if self._inflight.get(callsign, None) is task:
+                        del self._inflight[callsign]
+                    task.cancel()
+
+        def _refresh(self, callsign: str):
+            """Start looking up an expired callsign in the background, unless too many refreshes are running already"""
+            if callsign in self._inflight or len(self._refreshes) >= self._max_refreshes:
+                return
+            task = asyncio.ensure_future(self._lookup_once(callsign))
+            self._refreshes.add(task)
+            task.add_done_callback(self._refresh_done)
+
+        def _refresh_done(self, task: asyncio.Future):
+            self._refreshes.discard(task)
+            # failures are dropped; the stale result stays usable until the cache's max_stale is reached
+            if not task.cancelled():
+                task.exception()
+
+        def _forget_inflight(self, callsign: str, task: asyncio.Future):
+            if self._inflight.get(callsign, None) is task:
+                del self._inflight[callsign]
+            # mark the exception as retrieved, in case every search waiting for it was cancelled
+            if not task.cancelled():
+                task.exception()
+
+        async def _lookup(self, callsign: str) -> CallsignData:
+            try:
+                data = await self._fetch(callsign)
+            except CallsignNotFoundError as e:
+                if self._cache is not None:
+                    self._cache.put_not_found(self._data_source, callsign, e)
+                raise
+            if self._cache is not None:
+                self._cache.put(self._data_source, callsign, data)
+            return data
+
+        async def _fetch(self, callsign: str) -> CallsignData:
+            # the database is used from a thread so a busy database doesn't block the event loop
+            if self._response_cache is not None:
+                cached = await asyncio.to_thread(self._response_cache.get, self._data_source, callsign)
+                if cached is not None:
+                    return self._process_search(query=callsign, resp=cached)
+
+            self._check_quota()
+            try:
+                resp = await self._do_search(callsign)
+            finally:
+                self._release_quota()
+            data = self._process_search(query=callsign, resp=resp)
+            if self._response_cache is not None:
+                await asyncio.to_thread(self._response_cache.put, self._data_source, callsign, resp)
+            return data
+
+        async def _do_search(self, callsign: str) -> bytes:
+            return await self._request(callsign=callsign)
+
+        async def _request(self, **query) -> bytes:
+            """Send a query to the lookup source, subject to the circuit breaker, rate limiter, and retry policy"""
+            attempt = 1
+            while True:
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.before_request(self._data_source)
+                await self._rate_limiter.wait_async(self._data_source)
+                started = monotonic()
+                try:
+                    resp = await self._do_query(**query)
+                except CallsignLookupError as e:
+                    self._record(started, e)
+                    delay = self._retry.next_delay(attempt, e) if self._retry is not None else None
+                    if delay is None:
+                        raise
+                else:
+                    self._record(started)
+                    self._record_usage(resp)
+                    return resp
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        def _record(self, started: float, error: Optional[CallsignLookupError] = None):
+            """Report the outcome of a request to the circuit breaker and the concurrency limiter"""
+            if self._circuit_breaker is not None:
+                self._circuit_breaker.record(self._data_source, error)
+            if self._concurrency_limiter is not None:
+                self._concurrency_limiter.record(started, error)
+
+        def _request_timeout(self) -> aiohttp.ClientTimeout:
+            """Get the connect and read timeouts for a request"""
+            return aiohttp.ClientTimeout(total=None, sock_connect=self._timeout.connect, sock_read=self._timeout.read)
+
+        @abstractmethod
+        async def _do_query(self, **query) -> bytes:  # type: ignore[override]
+            pass
+
+    class AsyncXmlAuthMixin(XmlAuthMixin, AsyncMixin):
+        #: the login currently in flight, shared by every coroutine waiting on a new session key
+        _login_task: Optional[asyncio.Future] = None
+        #: the background task that replaces the session key before it expires
+        _session_refresh_task: Optional[asyncio.Future] = None
+        #: the login the background refresh has in flight, which searches that have their key rejected wait for
+        _refresh_login_task: Optional[asyncio.Future] = None
+        #: how long before the session key expires to replace it in the background, in seconds
+        _session_refresh_margin = 300.0
+
+        async def _login(self, **query):
+            self._process_login(await self._request(**query))
+            if self._session_store is not None:
+                await asyncio.to_thread(self._store_session)
+            self._schedule_session_refresh()
+
+        async def _renew_session(self, stale_key: str):
+            """Replace ``stale_key`` with the session store's key if another process has already logged in,
+            or by logging in"""
+            if self._session_store is not None:
+                stored = await asyncio.to_thread(self._session_store.get, self._data_source, self._username)
+                if self._adopt_stored_session(stored, stale_key):
+                    self._schedule_session_refresh()
+                    return
+            await self._login(**self._login_query())
+
+        def _schedule_session_refresh(self):
+            """Start a background task to log in again shortly before the new session key expires"""
+            # a refresh waiting on the login that got here is cancelled too, but the login itself is shielded
+            if self._session_refresh_task is not None:
+                self._session_refresh_task.cancel()
+            self._session_refresh_task = None
+            if self._session_expires is None:
+                return
+            delay = max(self._session_expires - self._session_refresh_margin - time(), 0)
+            self._session_refresh_task = asyncio.ensure_future(self._refresh_session(delay))
+            self._session_refresh_task.add_done_callback(self._session_refresh_done)
+
+        async def _refresh_session(self, delay: float):
+            await asyncio.sleep(delay)
+            # kept apart from the shared login, so searches go on with the current key meanwhile
+            # instead of waiting for the new one
+            task = self._refresh_login_task = asyncio.ensure_future(self._renew_session(self._session_key))
+            task.add_done_callback(self._clear_refresh_login_task)
+            await asyncio.shield(task)
+
+        def _clear_refresh_login_task(self, task: asyncio.Future):
+            if self._refresh_login_task is task:
+                self._refresh_login_task = None
+            if not task.cancelled():
+                task.exception()
+
+        def _session_refresh_done(self, task: asyncio.Future):
+            if self._session_refresh_task is task:
+                self._session_refresh_task = None
+            # failures are dropped; searches log in on their own once the key is rejected or expires
+            if not task.cancelled():
+                task.exception()
+
+        async def close_session(self):
+            if self._session_refresh_task is not None:
+                self._session_refresh_task.cancel()
+                self._session_refresh_task = None
+            if self._refresh_login_task is not None:
+                self._refresh_login_task.cancel()
+                self._refresh_login_task = None
+            await super().close_session()
+
+        async def _check_session(self, **query):
+            self._process_check_session(await self._request(**query))
+
+        async def warmup(self, connections: int = 1):
+            """Log in and open connections to the lookup source ahead of time, so the first searches don't have to.
+            An existing session key is checked, and only replaced if it is no longer valid.
+
+            :param connections: the number of connections to open and keep in the session's pool
+            """
+            key = self._session_key
+            try:
+                if not key:
+                    raise CallsignLookupError("No session key")
+                await self._check_session(**self._session_query())
+            except CallsignLookupError:
+                await self._relogin(key)
+            if self._session_refresh_task is None:
+                self._schedule_session_refresh()
+            if connections > 1:
+                await asyncio.gather(*[self._check_session(**self._session_query()) for _ in range(connections)])
+
+        async def _relogin(self, stale_key: str):
+            """Log in again, unless another coroutine already replaced ``stale_key``.
+
+            Concurrent callers share a single login request instead of each logging in on their own,
+            and wait for the background refresh if it is already logging in.
+            """
+            if self._login_task is None and self._refresh_login_task is not None:
+                # waited on without raising, so a failed refresh falls back to logging in below
+                await asyncio.wait([self._refresh_login_task])
+            task = self._login_task
+            if task is None:
+                if self._session_key != stale_key:
+                    return
+                task = self._login_task = asyncio.ensure_future(self._renew_session(stale_key))
+                task.add_done_callback(self._clear_login_task)
+            # shielded so that a cancelled search doesn't cancel the login for everyone else
+            await asyncio.shield(task)
+
+        def _clear_login_task(self, task: asyncio.Future):
+            if self._login_task is task:
+                self._login_task = None
+
+        async def _do_search(self, callsign: str) -> bytes:
+            if self._login_task is not None:
+                await asyncio.shield(self._login_task)
+
+            if not self._optimistic:
+                key = self._session_key
+                try:
+                    await self._check_session(**self._session_query())
+                except CallsignLookupError:
+                    await self._relogin(key)
+                return await self._request(**self._session_query(), callsign=callsign)
+
+            if not self._session_key or self._session_expired():
+                await self._relogin(self._session_key)
+            key = self._session_key
+            resp = await self._request(**self._session_query(), callsign=callsign)
+            if self._is_session_error(resp, callsign):
+                await self._relogin(key)
+                resp = await self._request(**self._session_query(), callsign=callsign)
+            return resp
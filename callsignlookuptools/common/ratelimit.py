@@ -0,0 +1,132 @@
+"""
+rate limiting for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+import asyncio
+from threading import Lock
+from time import monotonic, sleep
+from typing import Optional
+
+from .enums import DataSource
+
+
+class TokenBucket:
+    """A token bucket that allows ``rate`` requests per second on average, and bursts of up to ``burst`` requests.
+
+    Tokens are reserved ahead of time, so callers that have to wait are served in the order they arrived.
+    It can be shared by any number of threads and event loops.
+
+    :param rate: the average number of requests allowed per second
+    :param burst: the number of requests that can be made at once after a quiet period
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = monotonic()
+        self._lock = Lock()
+
+    @property
+    def rate(self) -> float:
+        """the average number of requests allowed per second"""
+        return self._rate
+
+    @property
+    def burst(self) -> int:
+        """the number of requests that can be made at once after a quiet period"""
+        return self._burst
+
+    def reserve(self) -> float:
+        """Take a token from the bucket
+
+        :return: how long to wait before using the token, in seconds
+        """
+        with self._lock:
+            now = monotonic()
+            self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self._rate
+
+
+class RateLimiter:
+    """Rate limits for each lookup source, shared by every client that uses this limiter.
+
+    All clients use :data:`default_rate_limiter` unless they are given another one,
+    so every client in a process shares one budget per lookup source. Sources without a limit are not limited.
+    """
+    def __init__(self) -> None:
+        self._buckets: dict[DataSource, TokenBucket] = {}
+
+    def set_limit(self, source: DataSource, rate: float, burst: int = 1) -> None:
+        """Limit requests to a lookup source, replacing any existing limit
+
+        :param source: the lookup source to limit
+        :param rate: the average number of requests allowed per second
+        :param burst: the number of requests that can be made at once after a quiet period
+        """
+        self._buckets[source] = TokenBucket(rate, burst)
+
+    def remove_limit(self, source: DataSource) -> None:
+        """Stop limiting requests to a lookup source
+
+        :param source: the lookup source
+        """
+        self._buckets.pop(source, None)
+
+    def get_limit(self, source: DataSource) -> Optional[TokenBucket]:
+        """Get the limit for a lookup source
+
+        :param source: the lookup source
+        :return: the token bucket limiting the source, or ``None`` if it is not limited
+        """
+        return self._buckets.get(source, None)
+
+    def copy(self) -> "RateLimiter":
+        """Make a rate limiter with the same limits, whose requests don't count against this one's
+
+        :return: the new rate limiter
+        """
+        limiter = RateLimiter()
+        for source, bucket in self._buckets.items():
+            limiter.set_limit(source, bucket.rate, bucket.burst)
+        return limiter
+
+    def reserve(self, source: DataSource) -> float:
+        """Reserve a request to a lookup source
+
+        :param source: the lookup source
+        :return: how long to wait before sending the request, in seconds
+        """
+        bucket = self._buckets.get(source, None)
+        if bucket is None:
+            return 0.0
+        return bucket.reserve()
+
+    def wait(self, source: DataSource) -> None:
+        """Block until a request can be sent to a lookup source
+
+        :param source: the lookup source
+        """
+        delay = self.reserve(source)
+        if delay > 0:
+            sleep(delay)
+
+    async def wait_async(self, source: DataSource) -> None:
+        """Wait until a request can be sent to a lookup source, without blocking the event loop
+
+        :param source: the lookup source
+        """
+        delay = self.reserve(source)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+#: the rate limiter used by all clients that aren't given another one
+default_rate_limiter = RateLimiter()
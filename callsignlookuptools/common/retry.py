@@ -0,0 +1,63 @@
+"""
+retry policy for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+from dataclasses import dataclass
+from random import random
+from typing import Optional
+
+from .exceptions import CallsignLookupError, LookupConnectionError, LookupHttpError
+
+
+@dataclass
+class RetryPolicy:
+    """Describes how requests to a lookup service are retried after a connection failure or HTTP error.
+
+    The delay before each retry grows exponentially from :attr:`backoff`, up to :attr:`max_backoff`,
+    and is randomly shortened by up to :attr:`jitter` of its length so that clients don't retry in lockstep.
+    Callsigns that were not found are never retried.
+    """
+    #: the maximum number of attempts for each request, including the first one
+    max_attempts: int = 3
+    #: the delay before the first retry, in seconds
+    backoff: float = 0.5
+    #: the factor the delay grows by after each retry
+    multiplier: float = 2.0
+    #: the longest delay before a retry, in seconds
+    max_backoff: float = 30.0
+    #: the fraction of each delay that is randomised, from 0 (none) to 1 (the whole delay)
+    jitter: float = 1.0
+    #: the HTTP status codes that are retried
+    retry_statuses: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+    #: whether connection failures are retried
+    retry_connection_errors: bool = True
+    #: whether to wait as long as a ``Retry-After`` header asks, if it is no longer than :attr:`max_backoff`.
+    #: If it is longer, the request is not retried.
+    respect_retry_after: bool = True
+
+    def next_delay(self, attempt: int, error: CallsignLookupError) -> Optional[float]:
+        """Get how long to wait before retrying a failed request
+
+        :param attempt: the number of attempts made so far
+        :param error: the error raised by the last attempt
+        :return: the delay in seconds, or ``None`` if the request should not be retried
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if isinstance(error, LookupConnectionError):
+            if not self.retry_connection_errors:
+                return None
+        elif not isinstance(error, LookupHttpError) or error.status not in self.retry_statuses:
+            return None
+
+        delay = min(self.max_backoff, self.backoff * self.multiplier ** (attempt - 1))
+        delay *= 1 - self.jitter * random()
+        if self.respect_retry_after and isinstance(error, LookupHttpError) and error.retry_after is not None:
+            if error.retry_after > self.max_backoff:
+                return None
+            delay = max(delay, error.retry_after)
+        return delay
@@ -0,0 +1,85 @@
+"""
+session key storage for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+import os
+import sqlite3
+from os import PathLike
+from threading import Lock
+from time import time
+from typing import Optional, Union
+
+from .enums import DataSource
+
+
+class SqliteSessionStore:
+    """A persistent store of session keys for authenticated lookup sources, kept in an SQLite database.
+
+    Clients given the same store share one session key per lookup source and username, even across processes:
+    a client with no session key of its own starts with the stored key, and every login updates it.
+
+    :param path: the path of the database file. It will be created if it does not exist, readable and writable
+        only by its owner, as the session keys in it give access to the accounts.
+    :param timeout: how long to wait for another process to release the database, in seconds
+    """
+    def __init__(self, path: Union[str, PathLike], timeout: float = 30):
+        # created before sqlite3 gets to it, which would use the umask. SQLite gives the -wal and -shm files the
+        # same permissions as the database file.
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "source TEXT NOT NULL, username TEXT NOT NULL, session_key TEXT NOT NULL, issued REAL, expires REAL, "
+                "PRIMARY KEY (source, username))"
+            )
+
+    def get(self, source: DataSource, username: str) -> Optional[tuple[str, Optional[float], Optional[float]]]:
+        """Get a stored session key
+
+        :param source: the lookup source the session key is for
+        :param username: the username the session key is for
+        :return: the session key and when it was issued and expires as Unix timestamps (or ``None`` if unknown),
+            or ``None`` if there is no stored key or it has expired
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT session_key, issued, expires FROM sessions "
+                "WHERE source = ? AND username = ? AND (expires IS NULL OR expires > ?)",
+                (source.value, username, time())
+            ).fetchone()
+        return None if row is None else (row[0], row[1], row[2])
+
+    def put(self, source: DataSource, username: str, session_key: str,
+            issued: Optional[float] = None, expires: Optional[float] = None) -> None:
+        """Store a session key, replacing any stored key for the same lookup source and username
+
+        :param source: the lookup source the session key is for
+        :param username: the username the session key is for
+        :param session_key: the session key
+        :param issued: when the session key was issued, as a Unix timestamp
+        :param expires: when the session key expires, as a Unix timestamp
+        """
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                             (source.value, username, session_key, issued, expires))
+
+    def clear(self) -> None:
+        """Remove all stored session keys"""
+        with self._lock:
+            self._db.execute("DELETE FROM sessions")
+
+    def close(self) -> None:
+        """Close the database. The store can't be used after this."""
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
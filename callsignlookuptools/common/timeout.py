@@ -0,0 +1,22 @@
+"""
+timeouts for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(frozen=True)
+class Timeout:
+    """Describes how long a client waits for a lookup source, in seconds. ``None`` means no limit."""
+    #: how long to wait for a connection to the lookup source to be opened
+    connect: Optional[float] = 10.0
+    #: how long to wait for the lookup source to send data, between reads
+    read: Optional[float] = 30.0
+    #: the default deadline for a whole search, including logging in and checking the session.
+    #: It can be overridden for each search.
+    total: Optional[float] = None
@@ -0,0 +1,109 @@
+"""
+connection pooling for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+from importlib.util import find_spec
+from threading import Lock
+from typing import Optional
+
+if find_spec("requests"):
+    import requests
+    from requests.adapters import HTTPAdapter
+if find_spec("aiohttp"):
+    import aiohttp
+
+
+class Transport:
+    """Connection pooling settings, and the HTTP sessions built from them.
+
+    One transport can be given to any number of clients, sync or async, for any lookup source. All the sync clients
+    share one requests session, and all the async clients share one aiohttp session, so they reuse each other's open
+    connections. The sessions are created the first time a client needs them, and closed with :meth:`close`
+    and :meth:`aclose`.
+
+    :param max_connections: the maximum number of connections open at once (async clients only)
+    :param max_per_host: the maximum number of connections open at once to a single host. For sync clients, this is
+        the number of connections kept open for reuse.
+    :param keepalive: how long idle connections are kept open for reuse, in seconds (async clients only).
+        ``0`` closes connections after every request.
+    :param dns_cache_ttl: how long DNS results are cached, in seconds (async clients only). ``None`` caches them
+        forever, and ``0`` disables the cache.
+    """
+    def __init__(self, max_connections: int = 100, max_per_host: int = 10, keepalive: float = 15.0,
+                 dns_cache_ttl: Optional[int] = 300):
+        self._max_connections = max_connections
+        self._max_per_host = max_per_host
+        self._keepalive = keepalive
+        self._dns_cache_ttl = dns_cache_ttl
+        self._lock = Lock()
+        self._requests_session: Optional["requests.Session"] = None
+        self._aiohttp_session: Optional["aiohttp.ClientSession"] = None
+
+    @property
+    def max_connections(self) -> int:
+        """the maximum number of connections open at once"""
+        return self._max_connections
+
+    @property
+    def max_per_host(self) -> int:
+        """the maximum number of connections open at once to a single host"""
+        return self._max_per_host
+
+    @property
+    def keepalive(self) -> float:
+        """how long idle connections are kept open for reuse, in seconds"""
+        return self._keepalive
+
+    @property
+    def dns_cache_ttl(self) -> Optional[int]:
+        """how long DNS results are cached, in seconds"""
+        return self._dns_cache_ttl
+
+    def requests_session(self) -> "requests.Session":
+        """Get the requests session shared by sync clients, creating it if needed"""
+        with self._lock:
+            if self._requests_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_maxsize=self._max_per_host)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                if not self._keepalive:
+                    session.headers["Connection"] = "close"
+                self._requests_session = session
+            return self._requests_session
+
+    async def aiohttp_session(self) -> "aiohttp.ClientSession":
+        """Get the aiohttp session shared by async clients, creating it if needed"""
+        if self._aiohttp_session is None or self._aiohttp_session.closed:
+            if self._keepalive:
+                connector = aiohttp.TCPConnector(limit=self._max_connections, limit_per_host=self._max_per_host,
+                                                 keepalive_timeout=self._keepalive,
+                                                 use_dns_cache=self._dns_cache_ttl != 0,
+                                                 ttl_dns_cache=self._dns_cache_ttl or None)
+            else:
+                connector = aiohttp.TCPConnector(limit=self._max_connections, limit_per_host=self._max_per_host,
+                                                 force_close=True, use_dns_cache=self._dns_cache_ttl != 0,
+                                                 ttl_dns_cache=self._dns_cache_ttl or None)
+            self._aiohttp_session = aiohttp.ClientSession(connector=connector)
+        return self._aiohttp_session
+
+    def shares(self, session: object) -> bool:
+        """Check if a session is one of the sessions shared through this transport"""
+        return session is not None and (session is self._requests_session or session is self._aiohttp_session)
+
+    def close(self) -> None:
+        """Close the requests session shared by sync clients, if it was created"""
+        with self._lock:
+            if self._requests_session is not None:
+                self._requests_session.close()
+                self._requests_session = None
+
+    async def aclose(self) -> None:
+        """Close the aiohttp session shared by async clients, if it was created"""
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
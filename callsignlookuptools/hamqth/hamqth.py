@@ -13,6 +13,11 @@ from gridtools import Grid, LatLong
 from pydantic import BaseModel, validator
 
 from ..common import abcs, enums, functions, dataclasses, exceptions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.sessionstore import SqliteSessionStore
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 from ..common.constants import DEFAULT_USERAGENT
 
 
@@ -93,98 +98,129 @@ class HamQthDataModel(BaseModel):
         arbitrary_types_allowed = True
 
 
+def _parse_raw_data(resp: bytes) -> HamQthDataModel:
+    return HamQthDataModel.parse_obj(functions.xml_sections(resp)["search"])
+
+
 class HamQthClientAbc(abcs.LookupAbc, ABC):
     """The base class for HamQthSync and HamQthAsync. **This should not be used directly.**"""
     _base_url = "https://www.hamqth.com/xml.php?"
+    _data_source = enums.DataSource.HAMQTH
+    _session_lifetime: Optional[float] = 3600
 
     def __init__(self, username: str, password: str, session_key: str = "",
-                 useragent: str = DEFAULT_USERAGENT):
+                 useragent: str = DEFAULT_USERAGENT, *, optimistic: bool = False,
+                 cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 session_store: Optional[SqliteSessionStore] = None,
+                 keep_raw_data: bool = True):
         self._username = username
         self._password = password
         self._useragent = useragent
         self._session_key = session_key
-
-    @abstractmethod
-    def search(self, callsign: str) -> dataclasses.CallsignData:
-        pass
+        self._optimistic = optimistic
+        self._cache = cache
+        self._response_cache = response_cache
+        self._retry = retry
+        self._timeout = timeout
+        self._transport = transport
+        self._session_store = session_store
+        self._keep_raw_data = keep_raw_data
 
     @abstractmethod
     def _do_query(self, **query) -> bytes:
         pass
 
+    def _login_query(self) -> dict:
+        return {"u": self._username, "p": self._password, "prg": self._useragent}
+
+    def _session_query(self) -> dict:
+        return {"id": self._session_key, "prg": self._useragent}
+
     def _process_search(self, query: str, resp: bytes) -> dataclasses.CallsignData:
-        data = functions.xml2dict(resp, to_lower=False)
+        sections = functions.xml_sections(resp)
 
-        if "session" in data and "error" in data["session"]:
-            raise exceptions.CallsignLookupError(data["session"]["error"])
+        session = sections.get("session", {})
+        if "error" in session:
+            if "not found" in session["error"].lower():
+                raise exceptions.CallsignNotFoundError(session["error"])
+            raise exceptions.CallsignLookupError(session["error"])
 
-        if "search" not in data:
-            raise exceptions.CallsignLookupError("No data found for query " + query)
+        if "search" not in sections:
+            raise exceptions.CallsignNotFoundError("No data found for query " + query)
 
-        model_data = HamQthDataModel.parse_obj(data["search"])
+        # the fields are read straight from the response; the model is only built for raw_data, when it's read
+        record = sections["search"]
+        get = record.get
 
         calldata = dataclasses.CallsignData(
             query=query,
-            raw_data=model_data,
+            raw_data=(dataclasses.LazyRawData(_parse_raw_data, resp)  # type: ignore[arg-type]
+                      if self._keep_raw_data else None),
             data_source=enums.DataSource.HAMQTH
         )
 
-        calldata.callsign = model_data.callsign
+        calldata.callsign = get("callsign")
         calldata.name = dataclasses.Name(
-            nickname=model_data.nick,
-            name=model_data.adr_name,
+            nickname=get("nick"),
+            name=get("adr_name"),
         )
-        calldata.qth = model_data.qth
+        calldata.qth = get("qth")
         calldata.dxcc = dataclasses.Dxcc(
-            id=model_data.adif,
-            name=model_data.country,
+            id=functions.parse_int(get("adif")),
+            name=get("country"),
         )
-        calldata.itu_zone = model_data.itu
-        calldata.cq_zone = model_data.cq
-        calldata.grid = model_data.grid
+        calldata.itu_zone = functions.parse_int(get("itu"))
+        calldata.cq_zone = functions.parse_int(get("cq"))
+        if get("grid"):
+            calldata.grid = Grid(record["grid"])
         calldata.address = dataclasses.Address(
-            line1=model_data.adr_street1,
-            line2=model_data.adr_street2,
-            line3=model_data.adr_street3,
-            city=model_data.adr_city,
-            zip=model_data.adr_zip,
-            country=model_data.adr_country,
-            country_code=model_data.adr_adif,
-            state=model_data.us_state,
+            line1=get("adr_street1"),
+            line2=get("adr_street2"),
+            line3=get("adr_street3"),
+            city=get("adr_city"),
+            zip=get("adr_zip"),
+            country=get("adr_country"),
+            country_code=functions.parse_int(get("adr_adif")),
+            state=get("us_state"),
         )
-        calldata.county = model_data.us_county
-        calldata.oblast = model_data.oblast
-        calldata.dok = model_data.dok
-        calldata.iota = model_data.iota
+        calldata.county = get("us_county")
+        calldata.oblast = get("oblast")
+        calldata.dok = get("dok")
+        calldata.iota = get("iota")
         calldata.qsl = dataclasses.Qsl(
-            info=model_data.qsl_via,
-            lotw=model_data.lotw,
-            eqsl=model_data.eqsl,
-            mail=model_data.qsldirect,
-            bureau=model_data.qsl,
+            info=get("qsl_via"),
+            lotw=enums.QslStatus(functions.parse_flag(get("lotw"), "Y", "N")),
+            eqsl=enums.QslStatus(functions.parse_flag(get("eqsl"), "Y", "N")),
+            mail=enums.QslStatus(functions.parse_flag(get("qsldirect"), "Y", "N")),
+            bureau=enums.QslStatus(functions.parse_flag(get("qsl"), "Y", "N")),
         )
-        calldata.email = model_data.email
+        calldata.email = get("email")
         calldata.social_media = dataclasses.SocialMedia(
-            website=model_data.web,
-            jabber=model_data.jabber,
-            icq=model_data.icq,
-            msn=model_data.msn,
-            skype=model_data.skype,
-            facebook=model_data.facebook,
-            twitter=model_data.twitter,
-            google_plus=model_data.gplus,
-            youtube=model_data.youtube,
-            linkedin=model_data.linkedin,
-            flickr=model_data.flicker,
-            vimeo=model_data.vimeo,
+            website=get("web"),
+            jabber=get("jabber"),
+            icq=get("icq"),
+            msn=get("msn"),
+            skype=get("skype"),
+            facebook=get("facebook"),
+            twitter=get("twitter"),
+            google_plus=get("gplus"),
+            youtube=get("youtube"),
+            linkedin=get("linkedin"),
+            flickr=get("flicker"),
+            vimeo=get("vimeo"),
         )
-        calldata.born = model_data.birth_year
-        calldata.licensed = model_data.lic_year
-        calldata.image = dataclasses.Image(url=model_data.picture)
-        if model_data.latitude is not None and model_data.longitude is not None:
-            calldata.latlong = LatLong(lat=model_data.latitude, long=model_data.longitude)
-        calldata.continent = model_data.continent
-        calldata.timezone = dataclasses.Timezone(utc_offset=model_data.utc_offset)
-        calldata.url = f"https://www.hamqth.com/{model_data.callsign}"
+        calldata.born = functions.parse_int(get("birth_year"))
+        calldata.licensed = functions.parse_int(get("lic_year"))
+        calldata.image = dataclasses.Image(url=get("picture"))
+        lat, lon = functions.parse_float(get("latitude")), functions.parse_float(get("longitude"))
+        if lat is not None and lon is not None:
+            calldata.latlong = LatLong(lat=lat, long=lon)
+        calldata.continent = enums.Continent.__members__.get(get("continent", "").upper(), enums.Continent.NONE)
+        calldata.timezone = dataclasses.Timezone(utc_offset=get("utc_offset"))
+        calldata.url = f"https://www.hamqth.com/{get('callsign')}"
 
         return calldata
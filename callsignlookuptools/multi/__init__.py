@@ -0,0 +1 @@
+# this is here to satisfy mypy
@@ -0,0 +1,137 @@
+"""
+multi-source lookups for callsignlookuptools
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import fields, is_dataclass
+from enum import Enum
+from threading import Lock
+from time import monotonic
+from typing import Any, Generic, Optional, Sequence, TypeVar
+
+from ..common import abcs, dataclasses, exceptions
+from ..common.enums import DataSource
+
+
+ClientT = TypeVar("ClientT", bound=abcs.LookupAbc)
+
+
+class SourceStats:
+    """Counts the outcomes of the lookups a multi-source client sent to one lookup source
+
+    :param window: the number of recent response times kept for :meth:`latency`
+    """
+    def __init__(self, window: int = 256):
+        self._successes = 0
+        self._not_found = 0
+        self._errors = 0
+        self._circuit_open = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = Lock()
+
+    @property
+    def successes(self) -> int:
+        """the number of lookups that returned data"""
+        return self._successes
+
+    @property
+    def not_found(self) -> int:
+        """the number of lookups the source had no data for"""
+        return self._not_found
+
+    @property
+    def errors(self) -> int:
+        """the number of lookups that failed, including timeouts"""
+        return self._errors
+
+    @property
+    def circuit_open(self) -> int:
+        """the number of lookups skipped because the source's circuit breaker was open"""
+        return self._circuit_open
+
+    @property
+    def samples(self) -> int:
+        """the number of recent response times kept"""
+        return len(self._latencies)
+
+    def latency(self, quantile: float = 0.5) -> Optional[float]:
+        """Get a quantile of the recent response times of the source, counting lookups that returned data
+        or found nothing
+
+        :param quantile: the quantile, from 0 to 1
+        :return: the response time in seconds, or ``None`` if there have been no responses yet
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+    def record(self, started: float, error: Optional[exceptions.CallsignLookupError] = None) -> None:
+        """Record the outcome of a lookup
+
+        :param started: when the lookup started, from :func:`time.monotonic`
+        :param error: the error the lookup failed with, if any
+        """
+        with self._lock:
+            if isinstance(error, exceptions.CircuitOpenError):
+                self._circuit_open += 1
+                return
+            if error is None:
+                self._successes += 1
+            elif isinstance(error, exceptions.CallsignNotFoundError):
+                self._not_found += 1
+            else:
+                self._errors += 1
+                return
+            self._latencies.append(monotonic() - started)
+
+
+class MultiSourceClientAbc(ABC, Generic[ClientT]):
+    """The base class for clients that look callsigns up from several sources.
+    **This should not be used directly**.
+
+    :param clients: the clients to look callsigns up with
+    """
+    def __init__(self, clients: Sequence[ClientT]):
+        self._clients = list(clients)
+        self._stats = {c.data_source: SourceStats() for c in self._clients}
+
+    @property
+    def clients(self) -> list[ClientT]:
+        """the clients callsigns are looked up with"""
+        return self._clients
+
+    @property
+    def stats(self) -> dict[DataSource, SourceStats]:
+        """the outcome counters for each lookup source"""
+        return self._stats
+
+    @abstractmethod
+    def search(self, callsign: str) -> dataclasses.CallsignData:
+        pass
+
+    def _all_failed(self, callsign: str, errors: dict[DataSource, exceptions.CallsignLookupError]
+                    ) -> exceptions.CallsignLookupError:
+        """Get the error to raise when every source failed"""
+        if all(isinstance(e, exceptions.CallsignNotFoundError) for e in errors.values()):
+            return exceptions.CallsignNotFoundError("No data found for query " + callsign)
+        summary = "; ".join(f"{source.value}: {error}" for source, error in errors.items())
+        return exceptions.AllSourcesFailedError(f"Lookup failed on every source ({summary})", errors=errors)
+
+
+def is_missing(value: Any) -> bool:
+    """Check if a field of :class:`CallsignData` has no useful value, e.g. ``None``, an empty string,
+    ``NONE`` or unknown enum values (like :attr:`QslStatus.UNKNOWN`), or a helper dataclass with only missing fields"""
+    if value is None or value == "" or value == []:
+        return True
+    if isinstance(value, Enum):
+        return value.name == "NONE" or value.value is None
+    if is_dataclass(value) and not isinstance(value, type):
+        return all(is_missing(getattr(value, f.name)) for f in fields(value))
+    return False
@@ -0,0 +1,382 @@
+"""
+multi-source lookups: asynchronous edition
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+import asyncio
+from dataclasses import fields
+from time import monotonic
+from typing import Iterator, Optional, Sequence
+
+from ..common import dataclasses, exceptions, functions, mixins
+from ..common.enums import DataSource
+from .multi import MultiSourceClientAbc, SourceStats, is_missing
+
+
+class AsyncMultiSourceClientAbc(MultiSourceClientAbc[mixins.AsyncMixin]):
+    """The base class for async clients that look callsigns up from several sources.
+    **This should not be used directly**."""
+    async def _search_source(self, client: mixins.AsyncMixin, callsign: str) -> dataclasses.CallsignData:
+        started = monotonic()
+        try:
+            data = await client.search(callsign)
+        except exceptions.CallsignLookupError as e:
+            self._stats[client.data_source].record(started, e)
+            raise
+        self._stats[client.data_source].record(started)
+        return data
+
+
+class FallbackAsyncClient(AsyncMultiSourceClientAbc):
+    """Asynchronous client that tries several lookup sources in order, returning the first result found
+
+    A source is skipped if it has no data for the callsign, fails, or has an open circuit breaker.
+
+    If hedging is enabled, a source that hasn't answered within the hedge delay is left running while the lookup is
+    also sent to the next source. Whichever returns data first is used, and the other lookups are cancelled.
+
+    :param clients: the async clients to try, in order
+    :param hedge_delay: how long to wait for a source before also trying the next one, in seconds.
+        ``None`` disables hedging, unless ``hedge_quantile`` is set.
+    :param hedge_quantile: wait this quantile of the source's recent response times (e.g. ``0.95``) before also trying
+        the next one, instead of ``hedge_delay``. ``hedge_delay`` is used until enough response times are known.
+    """
+    #: the number of response times needed before ``hedge_quantile`` is used
+    _min_hedge_samples = 20
+
+    def __init__(self, clients: Sequence[mixins.AsyncMixin], *, hedge_delay: Optional[float] = None,
+                 hedge_quantile: Optional[float] = None):
+        super().__init__(clients)
+        self._hedge_delay = hedge_delay
+        self._hedge_quantile = hedge_quantile
+        self._hedges = 0
+
+    @property
+    def hedge_delay(self) -> Optional[float]:
+        """
+        :getter: gets how long to wait for a source before also trying the next one, in seconds
+
+        :setter: sets how long to wait for a source before also trying the next one, in seconds,
+            or ``None`` to only use ``hedge_quantile``
+        """
+        return self._hedge_delay
+
+    @hedge_delay.setter
+    def hedge_delay(self, val: Optional[float]):
+        self._hedge_delay = val
+
+    @property
+    def hedge_quantile(self) -> Optional[float]:
+        """
+        :getter: gets the quantile of a source's response times to wait before also trying the next one
+
+        :setter: sets the quantile of a source's response times to wait before also trying the next one,
+            or ``None`` to only use ``hedge_delay``
+        """
+        return self._hedge_quantile
+
+    @hedge_quantile.setter
+    def hedge_quantile(self, val: Optional[float]):
+        self._hedge_quantile = val
+
+    @property
+    def hedges(self) -> int:
+        """the number of extra lookups sent because a source was slow to answer"""
+        return self._hedges
+
+    async def search(self, callsign: str) -> dataclasses.CallsignData:  # type: ignore[override]
+        """Search for a callsign on each source in turn
+
+        :param callsign: the callsign to look up
+        :return: the data from the first source that has it
+        :raises: :class:`common.exceptions.CallsignNotFoundError` if no source has data for the callsign,
+            or :class:`common.exceptions.AllSourcesFailedError` if every source failed and some did not say why
+        """
+        if not functions.is_callsign(callsign):
+            raise exceptions.CallsignLookupError("Invalid Callsign")
+        errors: dict[DataSource, exceptions.CallsignLookupError] = {}
+        remaining = iter(self._clients)
+        pending: dict[asyncio.Task, mixins.AsyncMixin] = {}
+        latest = self._launch(remaining, pending, callsign)
+        try:
+            while pending:
+                delay = self._hedge_delay_for(latest) if latest is not None else None
+                done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    latest = self._launch(remaining, pending, callsign)
+                    if latest is not None:
+                        self._hedges += 1
+                    continue
+                for task in done:
+                    client = pending.pop(task)
+                    try:
+                        return task.result()
+                    except exceptions.CallsignLookupError as e:
+                        errors[client.data_source] = e
+                # a source failed, so fall through to the next one straight away, even if others are still running
+                latest = self._launch(remaining, pending, callsign)
+        finally:
+            for task in pending:
+                task.cancel()
+        raise self._all_failed(callsign, errors)
+
+    def _launch(self, remaining: Iterator[mixins.AsyncMixin], pending: dict[asyncio.Task, mixins.AsyncMixin],
+                callsign: str) -> Optional[mixins.AsyncMixin]:
+        """Start a lookup on the next source, if there is one"""
+        client = next(remaining, None)
+        if client is not None:
+            pending[asyncio.ensure_future(self._search_source(client, callsign))] = client
+        return client
+
+    def _hedge_delay_for(self, client: mixins.AsyncMixin) -> Optional[float]:
+        """Get how long to wait for a source before also trying the next one, or ``None`` to wait until it finishes"""
+        if client is self._clients[-1]:
+            return None
+        stats = self._stats[client.data_source]
+        if self._hedge_quantile is not None and stats.samples >= self._min_hedge_samples:
+            return stats.latency(self._hedge_quantile)
+        return self._hedge_delay
+
+
+class AggregateAsyncClient(AsyncMultiSourceClientAbc):
+    """Asynchronous client that looks a callsign up on every source at the same time,
+    and combines the results field by field
+
+    Each field is taken from the first source in the precedence order that has a value for it.
+    Sources that fail, have no data, or don't answer before the deadline only leave out their own fields.
+    Lookups still running at the deadline are cancelled.
+
+    :param clients: the async clients to look callsigns up with
+    :param precedence: the order sources are preferred in. Sources not listed follow in the order of ``clients``.
+    :param field_precedence: the order sources are preferred in for specific fields, by field name,
+        e.g. ``{"grid": [DataSource.QRZ, DataSource.HAMQTH]}``. Sources not listed follow in the order of
+        ``precedence``.
+    :param deadline: how long to wait for the sources, in seconds, or ``None`` to wait for all of them
+    """
+    def __init__(self, clients: Sequence[mixins.AsyncMixin], *, precedence: Optional[Sequence[DataSource]] = None,
+                 field_precedence: Optional[dict[str, Sequence[DataSource]]] = None,
+                 deadline: Optional[float] = None):
+        super().__init__(clients)
+        self._precedence = self._order(precedence or [], [c.data_source for c in self._clients])
+        self._field_precedence = {name: self._order(order, self._precedence)
+                                  for name, order in (field_precedence or {}).items()}
+        self._deadline = deadline
+
+    @property
+    def precedence(self) -> list[DataSource]:
+        """the order sources are preferred in"""
+        return self._precedence
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """
+        :getter: gets how long to wait for the sources, in seconds
+
+        :setter: sets how long to wait for the sources, in seconds, or ``None`` to wait for all of them
+        """
+        return self._deadline
+
+    @deadline.setter
+    def deadline(self, val: Optional[float]):
+        self._deadline = val
+
+    async def search(self, callsign: str) -> dataclasses.MergedCallsignData:  # type: ignore[override]
+        """Search for a callsign on every source, and combine the results
+
+        :param callsign: the callsign to look up
+        :return: the combined data
+        :raises: :class:`common.exceptions.CallsignNotFoundError` if no source has data for the callsign,
+            or :class:`common.exceptions.AllSourcesFailedError` if every source failed and some did not say why
+        """
+        if not functions.is_callsign(callsign):
+            raise exceptions.CallsignLookupError("Invalid Callsign")
+        started = monotonic()
+        tasks = {asyncio.ensure_future(self._search_source(c, callsign)): c for c in self._clients}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._deadline)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        results: dict[DataSource, dataclasses.CallsignData] = {}
+        errors: dict[DataSource, exceptions.CallsignLookupError] = {}
+        for task, client in tasks.items():
+            if task not in done:
+                error = exceptions.LookupTimeoutError(f"{client.data_source.value} did not answer within "
+                                                      f"{self._deadline}s")
+                self._stats[client.data_source].record(started, error)
+                errors[client.data_source] = error
+                continue
+            try:
+                results[client.data_source] = task.result()
+            except exceptions.CallsignLookupError as e:
+                errors[client.data_source] = e
+        if not results:
+            raise self._all_failed(callsign, errors)
+        return self._merge(results)
+
+    def _merge(self, results: dict[DataSource, dataclasses.CallsignData]) -> dataclasses.MergedCallsignData:
+        primary_source = next(source for source in self._precedence if source in results)
+        primary = results[primary_source]
+        values = {}
+        field_sources = {}
+        for f in fields(dataclasses.CallsignData):
+            if f.name in ("query", "raw_data", "data_source"):
+                continue
+            for source in self._field_precedence.get(f.name, self._precedence):
+                data = results.get(source, None)
+                if data is not None and not is_missing(getattr(data, f.name)):
+                    values[f.name] = getattr(data, f.name)
+                    field_sources[f.name] = source
+                    break
+        # the primary result's raw data is only parsed if it's read from the merged result
+        raw_data = dataclasses.LazyRawData(getattr, primary, "raw_data")
+        return dataclasses.MergedCallsignData(query=primary.query, raw_data=raw_data,  # type: ignore[arg-type]
+                                              data_source=primary_source, field_sources=field_sources,
+                                              results=results, **values)
+
+    @staticmethod
+    def _order(preferred: Sequence[DataSource], rest: Sequence[DataSource]) -> list[DataSource]:
+        """Get ``preferred`` followed by the sources in ``rest`` that aren't in it"""
+        return list(preferred) + [source for source in rest if source not in preferred]
+
+
+class _Account:
+    """The rotation state for one account in an :class:`AccountPoolAsyncClient`"""
+    def __init__(self, client: mixins.AsyncXmlAuthMixin) -> None:
+        self.client = client
+        self.in_flight = 0
+        self.sent = 0
+        self.failures = 0
+        self.retired_until: Optional[float] = None
+
+
+class AccountPoolAsyncClient:
+    """Asynchronous client that spreads lookups over several accounts on the same lookup source
+
+    Each lookup goes to the account with the fewest lookups in flight, and of those the one that has sent the fewest
+    lookups, so the load and the daily quotas are used evenly. An account is taken out of rotation for
+    ``cooldown`` seconds once it has used up its budget (see :class:`common.exceptions.QuotaExceededError`),
+    or after ``failure_threshold`` consecutive failures that are specific to the account, like a failed login.
+    Lookups that fail that way are tried again on the next account.
+
+    Errors that affect the whole lookup source, like connection failures, and callsigns the source has no data for,
+    are raised straight away.
+
+    Rate limits apply to each account, so clients that share a :class:`common.ratelimit.RateLimiter`
+    (like :data:`common.ratelimit.default_rate_limiter`) are given copies of it when the pool is made.
+
+    :param clients: the async clients to look callsigns up with, one per account, all for the same lookup source
+    :param failure_threshold: the number of consecutive account failures that takes an account out of rotation
+    :param cooldown: how long an account stays out of rotation, in seconds
+    """
+    def __init__(self, clients: Sequence[mixins.AsyncXmlAuthMixin], *, failure_threshold: int = 3,
+                 cooldown: float = 300.0):
+        if not clients:
+            raise ValueError("An account pool needs at least one client")
+        if len({c.data_source for c in clients}) > 1:
+            raise ValueError("All clients in an account pool must be for the same lookup source")
+        if len({c.username for c in clients}) < len(clients):
+            raise ValueError("All clients in an account pool must use different accounts")
+        limiters: set[int] = set()
+        for c in clients:
+            # otherwise the accounts would all take turns within one account's rate limit
+            if id(c.rate_limiter) in limiters:
+                c.rate_limiter = c.rate_limiter.copy()
+            limiters.add(id(c.rate_limiter))
+        self._accounts = [_Account(c) for c in clients]
+        self._stats = {c.username: SourceStats() for c in clients}
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+
+    @property
+    def clients(self) -> list[mixins.AsyncXmlAuthMixin]:
+        """the clients callsigns are looked up with, one per account"""
+        return [a.client for a in self._accounts]
+
+    @property
+    def data_source(self) -> DataSource:
+        """the lookup source the accounts are for"""
+        return self._accounts[0].client.data_source
+
+    @property
+    def stats(self) -> dict[str, SourceStats]:
+        """the outcome counters for each account, by username"""
+        return self._stats
+
+    @property
+    def in_rotation(self) -> list[str]:
+        """the usernames of the accounts lookups can currently be sent to"""
+        now = monotonic()
+        return [a.client.username for a in self._accounts if self._available(a, now)]
+
+    async def search(self, callsign: str) -> dataclasses.CallsignData:
+        """Search for a callsign on the least-loaded account, moving on to the next account if it fails
+        for a reason specific to the account
+
+        :param callsign: the callsign to look up
+        :return: the callsign data
+        :raises: :class:`common.exceptions.CallsignLookupError` if the lookup fails, or no account is in rotation
+        """
+        if not functions.is_callsign(callsign):
+            raise exceptions.CallsignLookupError("Invalid Callsign")
+        tried: set[int] = set()
+        error: Optional[exceptions.CallsignLookupError] = None
+        while True:
+            account = self._pick(tried)
+            if account is None:
+                if error is not None:
+                    raise error
+                raise exceptions.CallsignLookupError(f"No {self.data_source.value} account is in rotation")
+            tried.add(id(account))
+            account.in_flight += 1
+            account.sent += 1
+            started = monotonic()
+            try:
+                data = await account.client.search(callsign)
+            except exceptions.CallsignLookupError as e:
+                self._stats[account.client.username].record(started, e)
+                if not self._is_account_error(e):
+                    account.failures = 0
+                    raise
+                self._fail(account, e)
+                error = e
+                continue
+            finally:
+                account.in_flight -= 1
+            self._stats[account.client.username].record(started)
+            account.failures = 0
+            return data
+
+    def _pick(self, tried: set[int]) -> Optional[_Account]:
+        """Get the least-loaded account in rotation that hasn't been tried yet"""
+        now = monotonic()
+        candidates = [a for a in self._accounts if id(a) not in tried and self._available(a, now)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda a: (a.in_flight, a.sent))
+
+    def _available(self, account: _Account, now: float) -> bool:
+        if account.retired_until is None:
+            return True
+        if now < account.retired_until:
+            return False
+        account.retired_until = None
+        account.failures = 0
+        return True
+
+    def _fail(self, account: _Account, error: exceptions.CallsignLookupError):
+        account.failures += 1
+        if isinstance(error, exceptions.QuotaExceededError) or account.failures >= self.failure_threshold:
+            account.retired_until = monotonic() + self.cooldown
+
+    @staticmethod
+    def _is_account_error(error: exceptions.CallsignLookupError) -> bool:
+        """Check if a lookup failed because of the account it was sent with, so another account could succeed"""
+        if isinstance(error, exceptions.LookupHttpError):
+            return error.status in (401, 403, 429)
+        return not isinstance(error, (exceptions.CallsignNotFoundError, exceptions.LookupConnectionError,
+                                      exceptions.CircuitOpenError))
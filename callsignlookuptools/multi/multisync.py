@@ -0,0 +1,48 @@
+"""
+multi-source lookups: synchronous edition
+---
+Copyright 2021-2023 classabbyamp, 0x5c
+Released under the terms of the BSD 3-Clause license.
+"""
+
+
+from time import monotonic
+from typing import Sequence
+
+from ..common import dataclasses, exceptions, functions, mixins
+from ..common.enums import DataSource
+from .multi import MultiSourceClientAbc
+
+
+class FallbackSyncClient(MultiSourceClientAbc[mixins.SyncMixin]):
+    """Synchronous client that tries several lookup sources in order, returning the first result found
+
+    A source is skipped if it has no data for the callsign, fails, or has an open circuit breaker.
+
+    :param clients: the sync clients to try, in order
+    """
+    def __init__(self, clients: Sequence[mixins.SyncMixin]):
+        super().__init__(clients)
+
+    def search(self, callsign: str) -> dataclasses.CallsignData:
+        """Search for a callsign on each source in turn
+
+        :param callsign: the callsign to look up
+        :return: the data from the first source that has it
+        :raises: :class:`common.exceptions.CallsignNotFoundError` if no source has data for the callsign,
+            or :class:`common.exceptions.AllSourcesFailedError` if every source failed and some did not say why
+        """
+        if not functions.is_callsign(callsign):
+            raise exceptions.CallsignLookupError("Invalid Callsign")
+        errors: dict[DataSource, exceptions.CallsignLookupError] = {}
+        for client in self._clients:
+            started = monotonic()
+            try:
+                data = client.search(callsign)
+            except exceptions.CallsignLookupError as e:
+                self._stats[client.data_source].record(started, e)
+                errors[client.data_source] = e
+                continue
+            self._stats[client.data_source].record(started)
+            return data
+        raise self._all_failed(callsign, errors)
@@ -6,14 +6,21 @@ Released under the terms of the BSD 3-Clause license.
 """
 
 
+import re
 from abc import ABC, abstractmethod
+from threading import Lock
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime, timezone
 
 from gridtools import Grid, LatLong
 from pydantic import BaseModel, Field, validator
 
 from ..common import abcs, enums, functions, dataclasses, exceptions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.sessionstore import SqliteSessionStore
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 from ..common.constants import DEFAULT_USERAGENT
 
 
@@ -118,115 +125,197 @@ class QrzDataModel(BaseModel):
         arbitrary_types_allowed = True
 
 
+def _parse_raw_data(resp: bytes) -> QrzDataModel:
+    return QrzDataModel.parse_obj(functions.xml_sections(resp)["Callsign"])
+
+
 class QrzClientAbc(abcs.LookupAbc, ABC):
     """The base class for QrzSync and QrzAsync. **This should not be used directly.**"""
     _base_url = "https://xmldata.qrz.com/xml/current/?"
+    _data_source = enums.DataSource.QRZ
+    _session_lifetime: Optional[float] = 24 * 3600
+    _count_re = re.compile(rb"<Count>\s*(\d+)\s*</Count>")
 
     def __init__(self, username: str, password: str, session_key: str = "",
-                 useragent: str = DEFAULT_USERAGENT):
+                 useragent: str = DEFAULT_USERAGENT, *, optimistic: bool = False,
+                 cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 session_store: Optional[SqliteSessionStore] = None,
+                 daily_budget: Optional[int] = None,
+                 keep_raw_data: bool = True):
         self._username = username
         self._password = password
         self._useragent = useragent
         self._session_key = session_key
+        self._optimistic = optimistic
+        self._cache = cache
+        self._response_cache = response_cache
+        self._retry = retry
+        self._timeout = timeout
+        self._transport = transport
+        self._session_store = session_store
+        self._daily_budget = daily_budget
+        self._keep_raw_data = keep_raw_data
+        self._lookup_count: Optional[int] = None
+        self._lookup_count_day: Optional[date] = None
+        #: lookups sent but not answered yet, which the last count doesn't include
+        self._lookups_in_flight = 0
+        self._quota_lock = Lock()
 
-    @abstractmethod
-    def search(self, callsign: str) -> dataclasses.CallsignData:
-        pass
+    @property
+    def lookup_count(self) -> Optional[int]:
+        """the number of lookups QRZ counted for the account in the current day, as of the last response,
+        or ``None`` before the first response"""
+        return self._lookup_count
+
+    @property
+    def daily_budget(self) -> Optional[int]:
+        """
+        :getter: gets the most lookups to make on the account per day, or ``None`` for no limit
+
+        :setter: sets the most lookups to make on the account per day, or ``None`` for no limit
+        """
+        return self._daily_budget
+
+    @daily_budget.setter
+    def daily_budget(self, val: Optional[int]) -> None:
+        self._daily_budget = val
+
+    def _check_quota(self):
+        with self._quota_lock:
+            # the count is only refreshed by responses, so a new day lets searches through to get the new count
+            if (self._daily_budget is not None and self._lookup_count is not None and
+                    self._lookup_count_day == datetime.now(timezone.utc).date() and
+                    self._lookup_count + self._lookups_in_flight >= self._daily_budget):
+                raise exceptions.QuotaExceededError(
+                    f"Daily QRZ lookup budget used up ({self._lookup_count} of {self._daily_budget}, "
+                    f"{self._lookups_in_flight} in flight)"
+                )
+            self._lookups_in_flight += 1
+
+    def _release_quota(self):
+        with self._quota_lock:
+            self._lookups_in_flight -= 1
+
+    def _record_usage(self, resp: bytes):
+        match = self._count_re.search(resp)
+        if match is not None:
+            self._lookup_count = int(match.group(1))
+            self._lookup_count_day = datetime.now(timezone.utc).date()
 
     @abstractmethod
     def _do_query(self, **query) -> bytes:
         pass
 
+    def _login_query(self) -> dict:
+        return {"username": self._username, "password": self._password, "agent": self._useragent}
+
+    def _session_query(self) -> dict:
+        return {"s": self._session_key}
+
     def _process_search(self, query: str, resp: bytes) -> dataclasses.CallsignData:
-        data = functions.xml2dict(resp, to_lower=False)
+        sections = functions.xml_sections(resp)
 
-        if "Session" in data and "Error" in data["Session"]:
-            raise exceptions.CallsignLookupError(data["Session"]["Error"])
+        session = sections.get("Session", {})
+        if "Error" in session:
+            if "not found" in session["Error"].lower():
+                raise exceptions.CallsignNotFoundError(session["Error"])
+            raise exceptions.CallsignLookupError(session["Error"])
 
-        if "Callsign" not in data:
-            raise exceptions.CallsignLookupError("No data found for query " + query)
+        if "Callsign" not in sections:
+            raise exceptions.CallsignNotFoundError("No data found for query " + query)
 
-        model_data = QrzDataModel.parse_obj(data["Callsign"])
+        # the fields are read straight from the response; the model is only built for raw_data, when it's read
+        record = sections["Callsign"]
+        get = record.get
 
         calldata = dataclasses.CallsignData(
             query=query,
-            raw_data=model_data,
+            raw_data=(dataclasses.LazyRawData(_parse_raw_data, resp)  # type: ignore[arg-type]
+                      if self._keep_raw_data else None),
             data_source=enums.DataSource.QRZ
         )
 
-        calldata.callsign = model_data.call
-        if model_data.xref:
-            calldata.query = model_data.xref
-        calldata.aliases = model_data.aliases
-        if model_data.trustee:
+        calldata.callsign = get("call")
+        if get("xref"):
+            calldata.query = record["xref"]
+        if get("aliases"):
+            calldata.aliases = [a.strip() for a in record["aliases"].split(",")]
+        if get("trustee"):
             calldata.trustee = dataclasses.Trustee(
-                callsign=model_data.trustee
+                callsign=get("trustee")
             )
-        calldata.lic_class = model_data.class_
-        calldata.lic_codes = model_data.codes
-        calldata.effective_date = model_data.efdate
-        calldata.expire_date = model_data.expdate
-        calldata.prev_call = model_data.p_call
-        calldata.modified_date = model_data.moddate
+        calldata.lic_class = get("class")
+        calldata.lic_codes = get("codes")
+        calldata.effective_date = functions.parse_datetime(get("efdate"))
+        calldata.expire_date = functions.parse_datetime(get("expdate"))
+        calldata.prev_call = get("p_call")
+        calldata.modified_date = functions.parse_datetime(get("moddate"))
         calldata.name = dataclasses.Name(
-            first=model_data.fname,
-            name=model_data.name,
-            nickname=model_data.nickname,
-            formatted_name=model_data.name_fmt
+            first=get("fname"),
+            name=get("name"),
+            nickname=get("nickname"),
+            formatted_name=get("name_fmt")
         )
         calldata.address = dataclasses.Address(
-            attn=model_data.attn,
-            line1=model_data.addr1,
-            city=model_data.addr2,
-            state=model_data.state,
-            zip=model_data.zip,
-            country=model_data.country,
-            country_code=model_data.ccode
+            attn=get("attn"),
+            line1=get("addr1"),
+            city=get("addr2"),
+            state=get("state"),
+            zip=get("zip"),
+            country=get("country"),
+            country_code=functions.parse_int(get("ccode"))
         )
         calldata.dxcc = dataclasses.Dxcc(
-            id=model_data.dxcc,
-            name=model_data.land
+            id=functions.parse_int(get("dxcc")),
+            name=get("land")
         )
-        if model_data.lat is not None and model_data.lon is not None:
-            calldata.latlong = LatLong(lat=model_data.lat, long=model_data.lon)
-        calldata.grid = model_data.grid
-        calldata.county = model_data.county
-        calldata.fips = model_data.fips
-        calldata.msa = model_data.MSA
-        calldata.area_code = model_data.AreaCode
-        calldata.cq_zone = model_data.cqzone
-        calldata.itu_zone = model_data.ituzone
-        calldata.iota = model_data.iota
-        calldata.geoloc_src = model_data.geoloc
+        lat, lon = functions.parse_float(get("lat")), functions.parse_float(get("lon"))
+        if lat is not None and lon is not None:
+            calldata.latlong = LatLong(lat=lat, long=lon)
+        if get("grid"):
+            calldata.grid = Grid(record["grid"])
+        calldata.county = get("county")
+        calldata.fips = get("fips")
+        calldata.msa = get("MSA")
+        calldata.area_code = get("AreaCode")
+        calldata.cq_zone = functions.parse_int(get("cqzone"))
+        calldata.itu_zone = functions.parse_int(get("ituzone"))
+        calldata.iota = get("iota")
+        calldata.geoloc_src = enums.GeoLocSource(get("geoloc", "none"))
         calldata.timezone = dataclasses.Timezone(
-            utc_offset=model_data.GMTOffset,
-            us_timezone=model_data.TimeZone,
-            observes_dst=model_data.DST
+            utc_offset=get("GMTOffset"),
+            us_timezone=get("TimeZone"),
+            observes_dst=functions.parse_flag(get("DST"), "Y", "N")
         )
         calldata.qsl = dataclasses.Qsl(
-            info=model_data.qslmgr,
-            eqsl=model_data.eqsl,
-            lotw=model_data.lotw,
-            mail=model_data.mqsl
+            info=get("qslmgr"),
+            eqsl=enums.QslStatus(functions.parse_flag(get("eqsl"))),
+            lotw=enums.QslStatus(functions.parse_flag(get("lotw"))),
+            mail=enums.QslStatus(functions.parse_flag(get("mqsl")))
         )
-        calldata.born = model_data.born
-        calldata.email = model_data.email
-        calldata.username = model_data.user
-        calldata.url = model_data.url if model_data.url else f"https://www.qrz.com/db/{model_data.call}"
-        calldata.page_views = model_data.u_views
-        calldata.db_serial = model_data.serial
+        calldata.born = functions.parse_int(get("born"))
+        calldata.email = get("email")
+        calldata.username = get("user")
+        calldata.url = get("url") or f"https://www.qrz.com/db/{get('call')}"
+        calldata.page_views = functions.parse_int(get("u_views"))
+        calldata.db_serial = get("serial")
         calldata.bio = dataclasses.Bio(
-            size=model_data.bio,
-            updated=model_data.biodate
+            size=functions.parse_int(get("bio")),
+            updated=functions.parse_datetime(get("biodate"))
         )
-        if model_data.imageinfo is not None and model_data.image:
+        imageinfo = [functions.parse_int(i) for i in get("imageinfo", "").split(":")]
+        if len(imageinfo) == 3 and None not in imageinfo and get("image"):
             calldata.image = dataclasses.Image(
-                url=model_data.image,
-                size=model_data.imageinfo[2],
-                height=model_data.imageinfo[0],
-                width=model_data.imageinfo[1]
+                url=get("image"),
+                size=imageinfo[2],
+                height=imageinfo[0],
+                width=imageinfo[1]
             )
-        elif model_data.image:
-            calldata.image = dataclasses.Image(url=model_data.image)
+        elif get("image"):
+            calldata.image = dataclasses.Image(url=get("image"))
 
         return calldata
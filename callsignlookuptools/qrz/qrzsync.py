@@ -11,9 +11,13 @@ from urllib.parse import urlencode
 
 import requests
 
-from ..common import mixins, dataclasses, exceptions
+from ..common import mixins, exceptions, functions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.sessionstore import SqliteSessionStore
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 from ..common.constants import DEFAULT_USERAGENT
-from ..common.functions import is_callsign
 from .qrz import QrzClientAbc
 
 
@@ -25,40 +29,54 @@ class QrzSyncClient(mixins.SyncXmlAuthMixin, mixins.SyncMixin, QrzClientAbc):
     :param session_key: QRZ login session key
     :param useragent: Useragent for QRZ
     :param session: A requests session to use for requests
+    :param optimistic: Send searches with the current session key without checking it first,
+        only logging in again if QRZ rejects the key
+    :param cache: A cache to answer searches from and store results in
+    :param response_cache: A persistent cache to store raw responses in and answer searches from
+    :param retry: A policy for retrying requests that fail with a connection or HTTP error
+    :param timeout: Timeouts for requests to the lookup source, and the default deadline for searches
+    :param transport: Connection pooling settings and shared sessions, used if no session is given
+    :param session_store: A store to share the session key through with other clients and processes
+        using the same account
+    :param daily_budget: The most lookups to make on the account per day, as counted by QRZ,
+        after which searches fail with :class:`QuotaExceededError` instead of being sent
+    :param keep_raw_data: Keep the raw data in results. If ``False``, :attr:`CallsignData.raw_data`
+        is ``None``, saving memory in large caches
     """
     def __init__(self, username: str, password: str, session_key: str = "",
                  useragent: str = DEFAULT_USERAGENT,
-                 session: Optional[requests.Session] = None):
-        if session is None:
-            self._session = requests.Session()
-        else:
+                 session: Optional[requests.Session] = None,
+                 *, optimistic: bool = False,
+                 cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 session_store: Optional[SqliteSessionStore] = None,
+                 daily_budget: Optional[int] = None,
+                 keep_raw_data: bool = True):
+        if session is not None:
             self._session = session
-        super().__init__(username, password, session_key=session_key, useragent=useragent)
-
-    def search(self, callsign: str) -> dataclasses.CallsignData:
-        if not is_callsign(callsign):
-            raise exceptions.CallsignLookupError("Invalid Callsign")
-        try:
-            self._check_session(
-                s=self._session_key
-            )
-        except exceptions.CallsignLookupError:
-            self._login(
-                username=self._username,
-                password=self._password,
-                agent=self._useragent
-            )
-
-        return self._process_search(
-            query=callsign.upper(),
-            resp=self._do_query(
-                s=self._session_key,
-                callsign=callsign.upper()
-            )
-        )
+        elif transport is not None:
+            self._session = transport.requests_session()
+        else:
+            self._session = requests.Session()
+            self._owns_session = True
+        super().__init__(username, password, session_key=session_key, useragent=useragent,
+                         optimistic=optimistic, cache=cache, response_cache=response_cache, retry=retry,
+                         timeout=timeout, transport=transport, session_store=session_store, daily_budget=daily_budget,
+                         keep_raw_data=keep_raw_data)
 
     def _do_query(self, **query) -> bytes:
-        with self._session.get(self._base_url + urlencode(query)) as resp:
-            if resp.status_code != 200:
-                raise exceptions.CallsignLookupError(f"Unable to connect to QRZ (HTTP Error {resp.status_code})")
-            return resp.content
+        try:
+            with self._session.get(self._base_url + urlencode(query), timeout=self._request_timeout()) as resp:
+                if resp.status_code != 200:
+                    raise exceptions.LookupHttpError(
+                        f"Unable to connect to QRZ (HTTP Error {resp.status_code})", status=resp.status_code,
+                        retry_after=functions.parse_retry_after(resp.headers.get("Retry-After", None))
+                    )
+                return resp.content
+        except requests.Timeout as e:
+            raise exceptions.LookupTimeoutError(f"Timed out waiting for QRZ ({e})") from e
+        except requests.RequestException as e:
+            raise exceptions.LookupConnectionError(f"Unable to connect to QRZ ({e})") from e
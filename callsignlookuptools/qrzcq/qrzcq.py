@@ -13,6 +13,11 @@ from gridtools import Grid, LatLong
 from pydantic import BaseModel, validator
 
 from ..common import abcs, enums, functions, dataclasses, exceptions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.sessionstore import SqliteSessionStore
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 from ..common.constants import DEFAULT_USERAGENT
 
 
@@ -77,80 +82,112 @@ class QrzCqDataModel(BaseModel):
         arbitrary_types_allowed = True
 
 
+def _parse_raw_data(resp: bytes) -> QrzCqDataModel:
+    return QrzCqDataModel.parse_obj(functions.xml_sections(resp)["Callsign"])
+
+
 class QrzCqClientAbc(abcs.LookupAbc, ABC):
     """The base class for QrzCqSync and QrzCqAsync. **This should not be used directly.**"""
     _base_url = "https://ssl.qrzcq.com/xml?"
+    _data_source = enums.DataSource.QRZCQ
+    _session_lifetime: Optional[float] = None
 
     def __init__(self, username: str, password: str, session_key: str = "",
-                 useragent: str = DEFAULT_USERAGENT):
+                 useragent: str = DEFAULT_USERAGENT, *, optimistic: bool = False,
+                 cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 session_store: Optional[SqliteSessionStore] = None,
+                 keep_raw_data: bool = True):
         self._username = username
         self._password = password
         self._useragent = useragent
         self._session_key = session_key
-
-    @abstractmethod
-    def search(self, callsign: str) -> dataclasses.CallsignData:
-        pass
+        self._optimistic = optimistic
+        self._cache = cache
+        self._response_cache = response_cache
+        self._retry = retry
+        self._timeout = timeout
+        self._transport = transport
+        self._session_store = session_store
+        self._keep_raw_data = keep_raw_data
 
     @abstractmethod
     def _do_query(self, **query) -> bytes:
         pass
 
+    def _login_query(self) -> dict:
+        return {"username": self._username, "password": self._password, "agent": self._useragent}
+
+    def _session_query(self) -> dict:
+        return {"s": self._session_key, "agent": self._useragent}
+
     def _process_search(self, query: str, resp: bytes) -> dataclasses.CallsignData:
-        data = functions.xml2dict(resp, to_lower=False)
+        sections = functions.xml_sections(resp)
 
-        if "Session" in data and "Error" in data["Session"]:
-            raise exceptions.CallsignLookupError(data["Session"]["Error"])
+        session = sections.get("Session", {})
+        if "Error" in session:
+            if "not found" in session["Error"].lower():
+                raise exceptions.CallsignNotFoundError(session["Error"])
+            raise exceptions.CallsignLookupError(session["Error"])
 
-        if "Callsign" not in data:
-            raise exceptions.CallsignLookupError("No data found for query " + query)
+        if "Callsign" not in sections:
+            raise exceptions.CallsignNotFoundError("No data found for query " + query)
 
-        model_data = QrzCqDataModel.parse_obj(data["Callsign"])
+        # the fields are read straight from the response; the model is only built for raw_data, when it's read
+        record = sections["Callsign"]
+        get = record.get
 
         calldata = dataclasses.CallsignData(
             query=query,
-            raw_data=model_data,
+            raw_data=(dataclasses.LazyRawData(_parse_raw_data, resp)  # type: ignore[arg-type]
+                      if self._keep_raw_data else None),
             data_source=enums.DataSource.QRZCQ
         )
 
-        calldata.callsign = model_data.call
-        calldata.name = dataclasses.Name(name=model_data.name)
-        calldata.qth = model_data.qth
+        dxcc = functions.parse_int(get("dxcc"))
+        calldata.callsign = get("call")
+        calldata.name = dataclasses.Name(name=get("name"))
+        calldata.qth = get("qth")
         calldata.address = dataclasses.Address(
-            line1=model_data.address,
-            city=model_data.city,
-            zip=model_data.zip,
-            state=model_data.state,
-            country=model_data.country,
-            country_code=model_data.dxcc,
+            line1=get("address"),
+            city=get("city"),
+            zip=get("zip"),
+            state=get("state"),
+            country=get("country"),
+            country_code=dxcc,
         )
-        calldata.lic_class = model_data.license
-        calldata.continent = model_data.continent
+        calldata.lic_class = get("license")
+        calldata.continent = enums.Continent.__members__.get(get("continent", "").upper(), enums.Continent.NONE)
         calldata.dxcc = dataclasses.Dxcc(
-            id=model_data.dxcc,
-            name=model_data.country,
+            id=dxcc,
+            name=get("country"),
         )
-        calldata.county = model_data.county
+        calldata.county = get("county")
         calldata.qsl = dataclasses.Qsl(
-            info=model_data.manager,
-            bureau_info=model_data.bmanager,
-            eqsl=model_data.eqsl,
-            lotw=model_data.lotw,
-            bureau=model_data.bqsl,
-            mail=model_data.mqsl,
+            info=get("manager"),
+            bureau_info=get("bmanager"),
+            eqsl=enums.QslStatus(functions.parse_flag(get("eqsl"))),
+            lotw=enums.QslStatus(functions.parse_flag(get("lotw"))),
+            bureau=enums.QslStatus(functions.parse_flag(get("bqsl"))),
+            mail=enums.QslStatus(functions.parse_flag(get("mqsl"))),
         )
-        calldata.grid = model_data.locator
-        if model_data.latitude is not None and model_data.longitude is not None:
-            calldata.latlong = LatLong(lat=model_data.latitude, long=model_data.longitude)
-        calldata.social_media = dataclasses.SocialMedia(website=model_data.website)
-        calldata.itu_zone = model_data.itu
-        calldata.cq_zone = model_data.cq
-        calldata.iota = model_data.iota
-        calldata.plot = model_data.plot
-        calldata.dok = model_data.dok
-        calldata.sondok = model_data.sondok
-        calldata.image = dataclasses.Image(url=model_data.qslpic)
-        calldata.dxcc_prefix = model_data.prefix
-        calldata.url = f"https://www.qrzcq.com/call/{model_data.call}"
+        if get("locator"):
+            calldata.grid = Grid(record["locator"])
+        lat, lon = functions.parse_float(get("latitude")), functions.parse_float(get("longitude"))
+        if lat is not None and lon is not None:
+            calldata.latlong = LatLong(lat=lat, long=lon)
+        calldata.social_media = dataclasses.SocialMedia(website=get("website"))
+        calldata.itu_zone = functions.parse_int(get("itu"))
+        calldata.cq_zone = functions.parse_int(get("cq"))
+        calldata.iota = get("iota")
+        calldata.plot = get("plot")
+        calldata.dok = get("dok")
+        calldata.sondok = functions.parse_flag(get("sondok"))
+        calldata.image = dataclasses.Image(url=get("qslpic"))
+        calldata.dxcc_prefix = get("prefix")
+        calldata.url = f"https://www.qrzcq.com/call/{get('call')}"
 
         return calldata
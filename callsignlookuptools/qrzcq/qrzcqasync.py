@@ -6,14 +6,19 @@ Released under the terms of the BSD 3-Clause license.
 """
 
 
+import asyncio
 from typing import Optional
 from urllib.parse import urlencode
 
 import aiohttp
 
-from ..common import mixins, dataclasses, exceptions
+from ..common import mixins, exceptions, functions
+from ..common.cache import LookupCache, SqliteResponseCache
+from ..common.retry import RetryPolicy
+from ..common.sessionstore import SqliteSessionStore
+from ..common.timeout import Timeout
+from ..common.transport import Transport
 from ..common.constants import DEFAULT_USERAGENT
-from ..common.functions import is_callsign
 from .qrzcq import QrzCqClientAbc
 
 
@@ -25,17 +30,48 @@ class QrzCqAsyncClient(mixins.AsyncXmlAuthMixin, mixins.AsyncMixin, QrzCqClientA
     :param session_key: QRZCQ login session key
     :param useragent: Useragent for QRZCQ
     :param session: An aiohttp session to use for requests
+    :param optimistic: Send searches with the current session key without checking it first,
+        only logging in again if QRZCQ rejects the key
+    :param cache: A cache to answer searches from and store results in
+    :param response_cache: A persistent cache to store raw responses in and answer searches from
+    :param retry: A policy for retrying requests that fail with a connection or HTTP error
+    :param timeout: Timeouts for requests to the lookup source, and the default deadline for searches
+    :param transport: Connection pooling settings and shared sessions, used if no session is given
+    :param session_store: A store to share the session key through with other clients and processes
+        using the same account
+    :param keep_raw_data: Keep the raw data in results. If ``False``, :attr:`CallsignData.raw_data`
+        is ``None``, saving memory in large caches
     """
     def __init__(self, username: str, password: str, session_key: str = "",
                  useragent: str = DEFAULT_USERAGENT,
-                 session: Optional[aiohttp.ClientSession] = None):
+                 session: Optional[aiohttp.ClientSession] = None,
+                 *, optimistic: bool = False,
+                 cache: Optional[LookupCache] = None,
+                 response_cache: Optional[SqliteResponseCache] = None,
+                 retry: Optional[RetryPolicy] = None,
+                 timeout: Timeout = Timeout(),
+                 transport: Optional[Transport] = None,
+                 session_store: Optional[SqliteSessionStore] = None,
+                 keep_raw_data: bool = True):
         self._session = session
-        super().__init__(username, password, session_key=session_key, useragent=useragent)
+        super().__init__(username, password, session_key=session_key, useragent=useragent,
+                         optimistic=optimistic, cache=cache, response_cache=response_cache, retry=retry,
+                         timeout=timeout, transport=transport, session_store=session_store,
+                         keep_raw_data=keep_raw_data)
 
     @classmethod
     async def new(cls, username: str, password: str, session_key: str = "",
                   useragent: str = DEFAULT_USERAGENT,
-                  session: Optional[aiohttp.ClientSession] = None):
+                  session: Optional[aiohttp.ClientSession] = None,
+                  *, optimistic: bool = False,
+                  cache: Optional[LookupCache] = None,
+                  response_cache: Optional[SqliteResponseCache] = None,
+                  retry: Optional[RetryPolicy] = None,
+                  timeout: Timeout = Timeout(),
+                  transport: Optional[Transport] = None,
+                  session_store: Optional[SqliteSessionStore] = None,
+                  keep_raw_data: bool = True,
+                  warmup: int = 0):
         """Creates a ``QrzCqAsyncClient`` object and automatically starts a session if not provided.
 
         :param username: QRZCQ username
@@ -43,42 +79,43 @@ class QrzCqAsyncClient(mixins.AsyncXmlAuthMixin, mixins.AsyncMixin, QrzCqClientA
         :param session_key: QRZCQ login session key
         :param useragent: Useragent for QRZCQ
         :param session: An aiohttp session to use for requests
+        :param optimistic: Send searches with the current session key without checking it first,
+            only logging in again if QRZCQ rejects the key
+        :param cache: A cache to answer searches from and store results in
+        :param response_cache: A persistent cache to store raw responses in and answer searches from
+        :param retry: A policy for retrying requests that fail with a connection or HTTP error
+        :param timeout: Timeouts for requests to the lookup source, and the default deadline for searches
+        :param transport: Connection pooling settings and shared sessions, used if no session is given
+        :param session_store: A store to share the session key through with other clients and processes
+            using the same account
+        :param keep_raw_data: Keep the raw data in results. If ``False``, :attr:`CallsignData.raw_data`
+            is ``None``, saving memory in large caches
+        :param warmup: Log in and open this many connections before returning (see :meth:`warmup`)
         """
-        obj = cls(username, password, session_key, useragent, session)
+        obj = cls(username, password, session_key, useragent, session, optimistic=optimistic, cache=cache,
+                  response_cache=response_cache, retry=retry, timeout=timeout, transport=transport,
+                  session_store=session_store, keep_raw_data=keep_raw_data)
         if obj.session is None:
             await obj.start_session()
+        if warmup:
+            await obj.warmup(warmup)
         return obj
 
-    async def search(self, callsign: str) -> dataclasses.CallsignData:  # type: ignore[override]
-        if not is_callsign(callsign):
-            raise exceptions.CallsignLookupError("Invalid Callsign")
-        try:
-            await self._check_session(
-                s=self._session_key,
-                agent=self._useragent
-            )
-        except exceptions.CallsignLookupError:
-            await self._login(
-                username=self._username,
-                password=self._password,
-                agent=self._useragent
-            )
-
-        return self._process_search(
-            query=callsign.upper(),
-            resp=await self._do_query(
-                s=self._session_key,
-                callsign=callsign.upper(),
-                agent=self._useragent
-            )
-        )
-
     async def _do_query(self, **query) -> bytes:  # type: ignore[override]
         if self._session is not None:
-            async with self._session.get(self._base_url + urlencode(query)) as resp:
-                if resp.status != 200:
-                    raise exceptions.CallsignLookupError(f"Unable to connect to QRZCQ (HTTP Error {resp.status})")
-                return await resp.read()
+            try:
+                async with self._session.get(self._base_url + urlencode(query),
+                                             timeout=self._request_timeout()) as resp:
+                    if resp.status != 200:
+                        raise exceptions.LookupHttpError(
+                            f"Unable to connect to QRZCQ (HTTP Error {resp.status})", status=resp.status,
+                            retry_after=functions.parse_retry_after(resp.headers.get("Retry-After", None))
+                        )
+                    return await resp.read()
+            except asyncio.TimeoutError as e:
+                raise exceptions.LookupTimeoutError("Timed out waiting for QRZCQ") from e
+            except aiohttp.ClientError as e:
+                raise exceptions.LookupConnectionError(f"Unable to connect to QRZCQ ({e})") from e
         else:
             raise exceptions.CallsignLookupError(("Session not initialised. "
                                                   "Hint: Call `.start_session()` once or use the `new()` classmethod."))
@@ -0,0 +1,115 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from callsignlookuptools.common import cache
+from callsignlookuptools.common.dataclasses import CallsignData
+from callsignlookuptools.common.enums import DataSource
+from callsignlookuptools.common.exceptions import CallsignNotFoundError
+
+
+def calldata(callsign: str, source: DataSource = DataSource.QRZ) -> CallsignData:
+    return CallsignData(query=callsign, raw_data=None, data_source=source, callsign=callsign)  # type: ignore
+
+
+def test_lookup_cache_hit_miss():
+    c = cache.LookupCache()
+    data = calldata("W1AW")
+    assert c.get(DataSource.QRZ, "W1AW") is None
+    c.put(DataSource.QRZ, "W1AW", data)
+    assert c.get(DataSource.QRZ, "w1aw ") is data
+    assert c.get(DataSource.HAMQTH, "W1AW") is None
+    assert (c.hits, c.misses) == (1, 2)
+
+
+def test_lookup_cache_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    c = cache.LookupCache(ttl=60)
+    c.put(DataSource.QRZ, "W1AW", calldata("W1AW"))
+    now[0] += 59
+    assert c.get(DataSource.QRZ, "W1AW") is not None
+    now[0] += 2
+    assert c.get(DataSource.QRZ, "W1AW") is None
+
+
+def test_lookup_cache_lru():
+    c = cache.LookupCache(maxsize=2)
+    for call in ("W1AW", "K1AA"):
+        c.put(DataSource.QRZ, call, calldata(call))
+    c.get(DataSource.QRZ, "W1AW")
+    c.put(DataSource.QRZ, "N0CALL", calldata("N0CALL"))
+    assert len(c) == 2
+    assert c.get(DataSource.QRZ, "K1AA") is None
+    assert c.get(DataSource.QRZ, "W1AW") is not None
+
+
+def test_lookup_cache_not_found(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    c = cache.LookupCache(ttl=3600, negative_ttl=60)
+    c.put_not_found(DataSource.QRZ, "W1XYZ", CallsignNotFoundError("Not found: W1XYZ"))
+    with pytest.raises(CallsignNotFoundError, match="Not found: W1XYZ"):
+        c.get(DataSource.QRZ, "W1XYZ")
+    assert c.get(DataSource.CALLOOK, "W1XYZ") is None
+    now[0] += 61
+    assert c.get(DataSource.QRZ, "W1XYZ") is None
+    assert (c.hits, c.negative_hits, c.misses) == (0, 1, 2)
+
+    c.put_not_found(DataSource.QRZ, "W1XYZ", CallsignNotFoundError("Not found: W1XYZ"))
+    c.put(DataSource.QRZ, "W1XYZ", calldata("W1XYZ"))
+    assert c.get(DataSource.QRZ, "W1XYZ") is not None
+
+
+def test_sqlite_response_cache_shared(tmp_path):
+    writer = cache.SqliteResponseCache(tmp_path / "responses.db")
+    reader = cache.SqliteResponseCache(tmp_path / "responses.db")
+    writer.put(DataSource.QRZ, "W1AW", b"<xml/>")
+    assert reader.get(DataSource.QRZ, "w1aw") == b"<xml/>"
+    assert reader.get(DataSource.HAMQTH, "W1AW") is None
+    assert (reader.hits, reader.misses) == (1, 1)
+    writer.close()
+    reader.close()
+
+
+def test_sqlite_response_cache_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", lambda: now[0])
+    c = cache.SqliteResponseCache(tmp_path / "responses.db", ttl=60)
+    c.put(DataSource.QRZ, "W1AW", b"<xml/>")
+    now[0] += 59
+    assert c.get(DataSource.QRZ, "W1AW") is not None
+    now[0] += 2
+    assert c.get(DataSource.QRZ, "W1AW") is None
+    c.put(DataSource.QRZ, "K1AA", b"<xml/>")
+    assert len(c) == 1
+
+
+def test_sqlite_response_cache_maxsize(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", lambda: now[0])
+    c = cache.SqliteResponseCache(tmp_path / "responses.db", maxsize=2)
+    c._trim_interval = 1
+    for call in ("W1AW", "K1AA", "N0CALL"):
+        now[0] += 1
+        c.put(DataSource.QRZ, call, call.encode())
+    assert len(c) == 2
+    assert c.get(DataSource.QRZ, "W1AW") is None
+    assert c.get(DataSource.QRZ, "N0CALL") == b"N0CALL"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no Unix file permissions on Windows")
+def test_sqlite_response_cache_private(tmp_path):
+    old_umask = os.umask(0o022)
+    try:
+        c = cache.SqliteResponseCache(tmp_path / "responses.db")
+        c.put(DataSource.QRZ, "W1AW", b"<Session><Key>abc</Key></Session>")
+        files = list(tmp_path.iterdir())
+        assert {f.name for f in files} >= {"responses.db", "responses.db-wal", "responses.db-shm"}
+        for f in files:
+            assert stat.S_IMODE(f.stat().st_mode) == 0o600, f.name
+        c.close()
+    finally:
+        os.umask(old_umask)
@@ -0,0 +1,77 @@
+import pytest
+
+from callsignlookuptools.common import circuit
+from callsignlookuptools.common.enums import CircuitState, DataSource
+from callsignlookuptools import (CircuitBreaker, CircuitOpenError, CallsignNotFoundError, LookupConnectionError,
+                                 LookupHttpError, RetryPolicy)
+from tests.stubserver import FlakyQrzClient
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_threshold(now):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    for _ in range(2):
+        breaker.record(DataSource.QRZ, LookupConnectionError(""))
+    breaker.record(DataSource.QRZ)
+    for _ in range(2):
+        breaker.record(DataSource.QRZ, LookupHttpError("", status=503))
+    breaker.record(DataSource.QRZ, LookupHttpError("", status=404))
+    breaker.record(DataSource.QRZ, CallsignNotFoundError(""))
+    assert breaker.state(DataSource.QRZ) == CircuitState.CLOSED
+    for _ in range(3):
+        breaker.record(DataSource.QRZ, LookupConnectionError(""))
+    assert breaker.state(DataSource.QRZ) == CircuitState.OPEN
+    assert breaker.state(DataSource.HAMQTH) == CircuitState.CLOSED
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(DataSource.QRZ)
+    breaker.before_request(DataSource.HAMQTH)
+
+
+def test_half_open_trial(now):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    breaker.record(DataSource.QRZ, LookupConnectionError(""))
+    now[0] += 10
+    assert breaker.state(DataSource.QRZ) == CircuitState.HALF_OPEN
+    breaker.before_request(DataSource.QRZ)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(DataSource.QRZ)
+    breaker.record(DataSource.QRZ, LookupConnectionError(""))
+    assert breaker.state(DataSource.QRZ) == CircuitState.OPEN
+
+    now[0] += 10
+    breaker.before_request(DataSource.QRZ)
+    breaker.record(DataSource.QRZ)
+    assert breaker.state(DataSource.QRZ) == CircuitState.CLOSED
+
+
+def test_abandoned_trial(now):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    breaker.record(DataSource.QRZ, LookupConnectionError(""))
+    now[0] += 10
+    breaker.before_request(DataSource.QRZ)
+    now[0] += 11
+    breaker.before_request(DataSource.QRZ)
+
+
+def test_client_fails_fast(now):
+    client = FlakyQrzClient([LookupConnectionError("down")] * 3, retry=RetryPolicy(max_attempts=5, backoff=0))
+    client.circuit_breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    with pytest.raises(CircuitOpenError):
+        client.search("W1AW")
+    with pytest.raises(CircuitOpenError):
+        client.search("W1AW")
+    assert client.attempts == 2
+    # the trial request fails and reopens the circuit before the retry
+    now[0] += 10
+    with pytest.raises(CircuitOpenError):
+        client.search("W1AW")
+    assert client.attempts == 3
+    now[0] += 10
+    assert client.search("W1AW").callsign == "W1AW"
+    assert client.circuit_breaker.state(DataSource.QRZ) == CircuitState.CLOSED
@@ -0,0 +1,60 @@
+import asyncio
+
+from callsignlookuptools.common import concurrency
+from callsignlookuptools import (AdaptiveConcurrency, CallsignNotFoundError, LookupConnectionError,
+                                 LookupHttpError)
+from tests.stubserver import stub_qrz_client
+
+
+def test_additive_increase(monkeypatch):
+    monkeypatch.setattr(concurrency, "monotonic", lambda: 10.0)
+    limiter = AdaptiveConcurrency(initial=2, max_limit=4)
+    for _ in range(8):
+        limiter.record(10.0)
+    assert limiter.limit == 4
+    for _ in range(20):
+        limiter.record(10.0)
+    assert limiter.limit == 4
+
+
+def test_multiplicative_decrease(monkeypatch):
+    now = [10.0]
+    monkeypatch.setattr(concurrency, "monotonic", lambda: now[0])
+    limiter = AdaptiveConcurrency(initial=16)
+    # requests that were already running when the limit dropped only drop it once
+    for _ in range(3):
+        limiter.record(9.0, LookupHttpError("", status=503))
+    assert limiter.limit == 8
+    now[0] = 11.0
+    limiter.record(10.5, LookupConnectionError(""))
+    assert limiter.limit == 4
+    limiter.record(11.0, LookupHttpError("", status=404))
+    limiter.record(11.0, CallsignNotFoundError(""))
+    assert limiter.limit == 4
+
+
+def test_latency_spike(monkeypatch):
+    now = [10.0]
+    monkeypatch.setattr(concurrency, "monotonic", lambda: now[0])
+    limiter = AdaptiveConcurrency(initial=10, latency_tolerance=3)
+    for _ in range(10):
+        limiter.record(now[0] - 0.1)
+    assert limiter.limit == 10
+    now[0] = 20.0
+    limiter.record(now[0] - 1.0)
+    assert limiter.limit == 5
+
+
+async def adaptive_batch(failures):
+    async with stub_qrz_client(delay=0.01, optimistic=True) as (server, client):
+        server.failures = failures
+        client.concurrency_limiter = AdaptiveConcurrency(initial=8)
+        results = await client.search_many([f"W{i}AW" for i in range(12)], concurrency=32)
+        return server, client.concurrency_limiter.limit, results
+
+
+def test_async_batch_adapts():
+    server, limit, results = asyncio.run(adaptive_batch([503] * 4))
+    assert server.max_active <= 8
+    assert sum(isinstance(r, LookupHttpError) for _, r in results) == 4
+    assert 4 <= limit < 8
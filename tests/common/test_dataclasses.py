@@ -1,7 +1,12 @@
+import pickle
+
 import pytest
 
+from callsignlookuptools import QrzSyncClient
 from callsignlookuptools.common import dataclasses as dc
-from callsignlookuptools.common.enums import QslStatus
+from callsignlookuptools.common.enums import DataSource, QslStatus
+from callsignlookuptools.qrz.qrz import QrzDataModel
+from tests.stubserver import qrz_xml
 
 
 dxcc_test_data = [
@@ -144,3 +149,39 @@ def test_qsl_str(info, bureau_info, mail, bureau, lotw, eqsl, expected):
         bureau=bureau,
     )
     assert str(qsl) == expected
+
+
+found_resp = qrz_xml("<Key>abc</Key>", "<Callsign><call>W1AW</call><fname>Hiram</fname></Callsign>")
+
+
+def test_raw_data_parsed_on_first_read():
+    calls = []
+
+    def parse(resp):
+        calls.append(resp)
+        return QrzDataModel.parse_obj({"call": "W1AW"})
+
+    data = dc.CallsignData(query="W1AW", raw_data=dc.LazyRawData(parse, b"resp"), data_source=DataSource.QRZ)
+    assert calls == []
+    assert data.raw_data.call == "W1AW"
+    assert data.raw_data is data.raw_data
+    assert calls == [b"resp"]
+
+
+def test_raw_data_from_response():
+    data = QrzSyncClient("u", "p")._process_search("W1AW", found_resp)
+    assert isinstance(data.raw_data, QrzDataModel)
+    assert data.raw_data.call == "W1AW"
+    assert data.raw_data.fname == "Hiram"
+    # unparsed raw data survives pickling, and is parsed from the response on the other side
+    copy = pickle.loads(pickle.dumps(QrzSyncClient("u", "p")._process_search("W1AW", found_resp)))
+    assert copy == data
+
+
+def test_raw_data_dropped():
+    client = QrzSyncClient("u", "p", keep_raw_data=False)
+    data = client._process_search("W1AW", found_resp)
+    assert data.raw_data is None
+    assert data.callsign == "W1AW"
+    client.keep_raw_data = True
+    assert client._process_search("W1AW", found_resp).raw_data is not None
@@ -1,5 +1,6 @@
 from unittest import TestCase
 from io import BytesIO
+from datetime import datetime
 
 import pytest
 from lxml import etree
@@ -75,3 +76,26 @@ def test_xml2dict(xml, to_lower, expected):
     tc = TestCase()
     tc.maxDiff = None
     tc.assertDictEqual(functions.xml2dict(xml, to_lower=to_lower), expected)
+
+
+@pytest.mark.parametrize("to_lower,expected", [pytest.param(False, xml2dict_expected, id="preserve_key_case"),
+                                               pytest.param(True, xml2dict_lower_expected, id="lower_keys")])
+def test_xml_sections(to_lower, expected):
+    assert functions.xml_sections(xml2dict_input_bytes, to_lower=to_lower) == expected
+
+
+def test_xml_sections_skips_empty_and_comments():
+    xml = b'<a xmlns="x"><!-- c --><b><c> A &amp; B </c><!-- d --><d/><e>  </e></b><f/></a>'
+    assert functions.xml_sections(xml) == {"b": {"c": "A & B"}, "f": {}}
+
+
+@pytest.mark.parametrize("parse,value,expected", [
+    (functions.parse_int, "291", 291), (functions.parse_int, "x", None), (functions.parse_int, None, None),
+    (functions.parse_float, "-72.72", -72.72), (functions.parse_float, "", None),
+    (functions.parse_datetime, "2021-02-25", datetime(2021, 2, 25)),
+    (functions.parse_datetime, "2021-02-25 03:12:09", datetime(2021, 2, 25, 3, 12, 9)),
+    (functions.parse_datetime, "0000-00-00", None),
+    (functions.parse_flag, "1", True), (functions.parse_flag, "0", False), (functions.parse_flag, "Y", None),
+])
+def test_field_parsers(parse, value, expected):
+    assert parse(value) == expected
@@ -0,0 +1,472 @@
+import asyncio
+import threading
+import time
+from datetime import date
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from callsignlookuptools.common import cache, mixins
+from callsignlookuptools import (QrzSyncClient, QrzAsyncClient, CallsignLookupError, CallsignNotFoundError,
+                                 QuotaExceededError,
+                                 LookupCache, SqliteResponseCache, SqliteSessionStore, Transport)
+from callsignlookuptools.common.enums import DataSource
+from tests.stubserver import QrzStubServer, qrz_xml, stub_qrz_client
+
+
+valid_session = "<Key>abc</Key><Count>1</Count>"
+found_resp = qrz_xml(valid_session, "<Callsign><call>W1AW</call></Callsign>")
+login_resp = qrz_xml(valid_session)
+
+
+class CannedQrzClient(QrzSyncClient):
+    """QRZ client that answers from a list of canned responses and records its queries"""
+    def __init__(self, responses, **kwargs):
+        super().__init__("user", "pass", **kwargs)
+        self.responses = list(responses)
+        self.queries = []
+
+    def _do_query(self, **query) -> bytes:
+        self.queries.append(query)
+        return self.responses.pop(0)
+
+
+class EmulatedQrzClient(QrzSyncClient):
+    """QRZ client that emulates the QRZ API in-process, so it can be shared between threads"""
+    def __init__(self, **kwargs):
+        super().__init__("user", "pass", **kwargs)
+        self.logins = 0
+        self.searches = 0
+
+    def _do_query(self, **query) -> bytes:
+        time.sleep(0.05 if "callsign" in query else 0.005)
+        if "callsign" in query:
+            self.searches += 1
+        if "username" in query:
+            self.logins += 1
+            return login_resp
+        if query.get("s") != "abc":
+            return qrz_xml("<Error>Invalid session key</Error>")
+        if "callsign" in query:
+            return qrz_xml(valid_session, f"<Callsign><call>{query['callsign']}</call></Callsign>")
+        return login_resp
+
+
+session_error_test_data = [
+    pytest.param(qrz_xml("<Error>Invalid session key</Error>"), True, id="invalid"),
+    pytest.param(qrz_xml("<Error>Session Timeout</Error>"), True, id="timeout"),
+    pytest.param(qrz_xml("<Error>Session does not exist or expired</Error>"), True, id="expired"),
+    pytest.param(qrz_xml("<Error>Not found: W1XYZ</Error>"), False, id="not_found"),
+    pytest.param(found_resp, False, id="no_error"),
+]
+
+
+@pytest.mark.parametrize("resp,expected", session_error_test_data)
+def test_is_session_error(resp, expected):
+    assert CannedQrzClient([])._is_session_error(resp) is expected
+
+
+def test_not_found_callsign_with_session_marker():
+    not_found = qrz_xml("<Error>Not found: W1SESSION</Error>")
+    assert CannedQrzClient([])._is_session_error(not_found, "W1SESSION") is False
+    assert CannedQrzClient([])._is_session_error(qrz_xml("<Error>Session Timeout</Error>"), "W1SESSION") is True
+    client = CannedQrzClient([qrz_xml("<Error>Not found: K2EXPIRED</Error>")], session_key="abc", optimistic=True)
+    with pytest.raises(CallsignNotFoundError):
+        client.search("K2EXPIRED")
+    assert client.queries == [{"s": "abc", "callsign": "K2EXPIRED"}]
+
+
+def test_optimistic_search_valid_key():
+    client = CannedQrzClient([found_resp], session_key="abc", optimistic=True)
+    assert client.search("w1aw").callsign == "W1AW"
+    assert client.queries == [{"s": "abc", "callsign": "W1AW"}]
+
+
+def test_optimistic_search_expired_key():
+    client = CannedQrzClient([qrz_xml("<Error>Session Timeout</Error>"), login_resp, found_resp],
+                             session_key="old", optimistic=True)
+    assert client.search("W1AW").callsign == "W1AW"
+    assert [q.get("s", "login") for q in client.queries] == ["old", "login", "abc"]
+
+
+def test_checked_search():
+    client = CannedQrzClient([login_resp, found_resp], session_key="abc")
+    assert client.search("W1AW").callsign == "W1AW"
+    assert client.queries == [{"s": "abc"}, {"s": "abc", "callsign": "W1AW"}]
+
+
+def test_cached_search():
+    client = CannedQrzClient([found_resp], session_key="abc", optimistic=True, cache=LookupCache())
+    first = client.search("W1AW")
+    assert client.search("w1aw") is first
+    assert len(client.queries) == 1
+    assert (client.cache.hits, client.cache.misses) == (1, 1)
+
+
+def test_negative_cached_search():
+    client = CannedQrzClient([qrz_xml("<Error>Not found: W1XYZ</Error>")], session_key="abc", optimistic=True,
+                             cache=LookupCache())
+    for _ in range(2):
+        with pytest.raises(CallsignNotFoundError):
+            client.search("W1XYZ")
+    assert len(client.queries) == 1
+
+
+def test_transient_error_not_cached():
+    class FailingQrzClient(CannedQrzClient):
+        def _do_query(self, **query) -> bytes:
+            self.queries.append(query)
+            raise CallsignLookupError("Unable to connect to QRZ (HTTP Error 503)")
+
+    client = FailingQrzClient([], session_key="abc", optimistic=True, cache=LookupCache())
+    for _ in range(2):
+        with pytest.raises(CallsignLookupError) as exc_info:
+            client.search("W1AW")
+        assert not isinstance(exc_info.value, CallsignNotFoundError)
+    assert len(client.queries) == 2
+
+
+def test_response_cached_search(tmp_path):
+    first = CannedQrzClient([found_resp], session_key="abc", optimistic=True,
+                            response_cache=SqliteResponseCache(tmp_path / "responses.db"))
+    second = CannedQrzClient([], response_cache=SqliteResponseCache(tmp_path / "responses.db"))
+    assert first.search("W1AW").callsign == "W1AW"
+    assert second.search("W1AW").callsign == "W1AW"
+    assert second.queries == []
+
+
+@pytest.mark.parametrize("optimistic", [False, True])
+def test_search_many_threaded(optimistic):
+    client = EmulatedQrzClient(session_key="stale", optimistic=optimistic)
+    calls = [f"W{i}AW" for i in range(40)] + ["N0CALL!"]
+    results = client.search_many(calls, concurrency=16)
+    assert client.logins == 1
+    assert [c for c, _ in results] == calls
+    assert [r.callsign for _, r in results[:-1]] == calls[:-1]
+    assert isinstance(results[-1][1], CallsignLookupError)
+    assert client.session.get_adapter(client._base_url)._pool_maxsize == 16
+
+
+def test_sync_search_coalescing():
+    client = EmulatedQrzClient(session_key="abc", optimistic=True)
+    results = client.search_many(["W1AW"] * 10, concurrency=10)
+    assert client.searches == 1
+    assert all(r is results[0][1] for _, r in results)
+
+
+async def concurrent_stale_searches(optimistic: bool, count: int):
+    async with stub_qrz_client(session_key="stale", delay=0.01, optimistic=optimistic) as (server, client):
+        results = await asyncio.gather(*[client.search(f"W{i}AW") for i in range(count)])
+        return server, results
+
+
+@pytest.mark.parametrize("optimistic", [False, True])
+def test_async_login_single_flight(optimistic):
+    server, results = asyncio.run(concurrent_stale_searches(optimistic, 200))
+    assert server.logins == 1
+    assert server.searches == (400 if optimistic else 200)
+    assert [r.callsign for r in results] == [f"W{i}AW" for i in range(200)]
+
+
+async def batch_searches(ordered: bool):
+    calls = [f"W{i}AW" for i in range(30)] + ["N0CALL!"]
+    async with stub_qrz_client(delay=0.01, optimistic=True) as (server, client):
+        results = [r async for r in client.search_stream(calls, concurrency=5, ordered=ordered)]
+        return server, calls, results
+
+
+@pytest.mark.parametrize("ordered", [False, True])
+def test_async_search_stream(ordered):
+    server, calls, results = asyncio.run(batch_searches(ordered))
+    assert server.max_active <= 5
+    assert sorted(c for c, _ in results) == sorted(calls)
+    if ordered:
+        assert [c for c, _ in results] == calls
+    for call, result in results:
+        if call == "N0CALL!":
+            assert isinstance(result, CallsignLookupError)
+        else:
+            assert result.callsign == call
+
+
+async def concurrent_identical_searches():
+    async with stub_qrz_client(delay=0.01, optimistic=True) as (server, client):
+        results = await asyncio.gather(*[client.search("W1AW") for _ in range(50)],
+                                       *[client.search("N0CALL") for _ in range(50)])
+        return server, results
+
+
+def test_async_search_coalescing():
+    server, results = asyncio.run(concurrent_identical_searches())
+    assert server.searches == 2
+    assert all(r is results[0] for r in results[:50])
+    assert all(r is results[50] for r in results[50:])
+
+
+async def abandoned_searches():
+    async with stub_qrz_client(delay=0.1, optimistic=True) as (server, client):
+        first, second = (asyncio.ensure_future(client.search("W1AW")) for _ in range(2))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        # the lookup carries on while a search is still waiting for it
+        shared = await second
+        abandoned = asyncio.ensure_future(client.search("W2AW"))
+        await asyncio.sleep(0.02)
+        abandoned.cancel()
+        await asyncio.sleep(0.01)
+        inflight = dict(client._inflight)
+        return shared, inflight
+
+
+def test_async_abandoned_lookup_cancelled():
+    shared, inflight = asyncio.run(abandoned_searches())
+    assert shared.callsign == "W1AW"
+    assert inflight == {}
+
+
+async def stale_searches(now):
+    async with stub_qrz_client(optimistic=True, cache=LookupCache(ttl=60, max_stale=600)) as (server, client):
+        first = await client.search("W1AW")
+        now[0] += 120
+        stale = await client.search("W1AW")
+        searches_before_refresh = server.searches
+        await asyncio.gather(*client._refreshes)
+        refreshed = await client.search("W1AW")
+        now[0] += 1000
+        expired = await client.search("W1AW")
+        return server, searches_before_refresh, first, stale, refreshed, expired
+
+
+def test_async_stale_while_revalidate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+    server, searches_before_refresh, first, stale, refreshed, expired = asyncio.run(stale_searches(now))
+    assert searches_before_refresh == 1
+    assert stale is first
+    assert refreshed is not first
+    assert expired is not refreshed
+    assert server.searches == 3
+
+
+def test_sync_warmup():
+    client = EmulatedQrzClient(session_key="stale")
+    client.warmup(connections=16)
+    assert client.logins == 1
+    assert client.session_key == "abc"
+    assert client.session.get_adapter(client._base_url)._pool_maxsize == 16
+    client.warmup()
+    assert client.logins == 1
+
+
+def test_sync_pool_left_alone_on_given_sessions():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=2, pool_block=True)
+    session.mount("https://", adapter)
+    transport = Transport(max_per_host=4)
+    for client in (EmulatedQrzClient(session_key="abc", session=session),
+                   EmulatedQrzClient(session_key="abc", transport=transport)):
+        before = client.session.get_adapter(client._base_url)
+        client.search_many(["W1AW", "W2AW"], concurrency=16)
+        assert client.session.get_adapter(client._base_url) is before
+    assert session.get_adapter("https://xmldata.qrz.com/") is adapter
+    transport.close()
+
+
+async def warmed_up_client():
+    async with stub_qrz_client(session_key="stale", delay=0.01, optimistic=True) as (server, client):
+        await client.warmup(connections=4)
+        logins, checks = server.logins, server.max_active
+        await client.search("W1AW")
+        return server, logins, checks
+
+
+def test_async_warmup():
+    server, logins, max_active = asyncio.run(warmed_up_client())
+    assert logins == 1
+    assert max_active == 4
+    assert server.logins == 1
+    assert server.searches == 1
+
+
+def test_session_expiry_tracked(monkeypatch):
+    monkeypatch.setattr(mixins, "time", lambda: 1000.0)
+    client = CannedQrzClient([found_resp, login_resp], session_key="old", optimistic=True)
+    assert client.session_expires is None
+    client.search("W1AW")
+    assert client.session_expires is None
+    client._relogin(client.session_key)
+    assert client.session_issued == 1000.0
+    assert client.session_expires == 1000.0 + 24 * 3600
+    client.session_key = "other"
+    assert client.session_issued is None
+    assert client.session_expires is None
+
+
+def test_expired_session_replaced_before_search(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(mixins, "time", lambda: now[0])
+    client = CannedQrzClient([login_resp, found_resp, login_resp, found_resp], optimistic=True)
+    client.search("W1AW")
+    now[0] += 24 * 3600
+    client.search("W1AW")
+    assert [q.get("s", "login") for q in client.queries] == ["login", "abc", "login", "abc"]
+
+
+async def background_session_refresh():
+    async with stub_qrz_client(session_key="", delay=0.01, optimistic=True) as (server, client):
+        client._session_lifetime = 0.5
+        client._session_refresh_margin = 0.3
+        await client.warmup()
+        first_expiry = client.session_expires
+        await asyncio.sleep(0.3)
+        logins = server.logins
+        refreshed_expiry = client.session_expires
+        await client.search("W1AW")
+    # closing the session cancels the refresh
+    return server, logins, first_expiry, refreshed_expiry, client._session_refresh_task
+
+
+def test_async_background_session_refresh():
+    server, logins, first_expiry, refreshed_expiry, refresh_task = asyncio.run(background_session_refresh())
+    assert logins == 2
+    assert refreshed_expiry > first_expiry
+    assert server.searches == 1
+    assert refresh_task is None
+
+
+async def search_rejected_during_refresh():
+    async with stub_qrz_client(session_key="", delay=0.2, optimistic=True) as (server, client):
+        client._session_lifetime = 1.2
+        client._session_refresh_margin = 0.8
+        await client.warmup()
+        # the refresh logs in from 0.4s to 0.6s; the search is rejected at 0.5s, while that login is in flight
+        await asyncio.sleep(0.3)
+        search = asyncio.ensure_future(client.search("W1AW"))
+        await asyncio.sleep(0.05)
+        server.key = "newkey"
+        data = await search
+        return server, data, client.session_key
+
+
+def test_async_search_shares_refresh_login():
+    server, data, session_key = asyncio.run(search_rejected_during_refresh())
+    assert data.callsign == "W1AW"
+    assert session_key == "newkey"
+    assert server.logins == 2
+    assert server.searches == 2
+
+
+async def search_during_refresh():
+    async with stub_qrz_client(session_key="", delay=0.2, optimistic=True) as (server, client):
+        client._session_lifetime = 1.2
+        client._session_refresh_margin = 0.8
+        await client.warmup()
+        # the refresh logs in from 0.4s to 0.6s; the search is sent at 0.45s with the key, which is still valid
+        await asyncio.sleep(0.45)
+        refreshing = client._refresh_login_task is not None
+        start = time.monotonic()
+        await client.search("W1AW")
+        return server, refreshing, time.monotonic() - start
+
+
+def test_async_search_not_held_up_by_refresh():
+    server, refreshing, elapsed = asyncio.run(search_during_refresh())
+    assert refreshing
+    assert elapsed < 0.3
+    assert server.logins == 2
+    assert server.searches == 1
+
+
+def test_session_store_shared_between_clients(tmp_path):
+    first = CannedQrzClient([login_resp, found_resp], optimistic=True,
+                            session_store=SqliteSessionStore(tmp_path / "sessions.db"))
+    first.search("W1AW")
+    second = CannedQrzClient([found_resp], optimistic=True, session_store=SqliteSessionStore(tmp_path / "sessions.db"))
+    assert second.session_key == "abc"
+    assert second.session_expires == first.session_expires
+    second.search("W1AW")
+    assert second.queries == [{"s": "abc", "callsign": "W1AW"}]
+
+
+def test_session_store_key_adopted_on_rejection(tmp_path):
+    store = SqliteSessionStore(tmp_path / "sessions.db")
+    client = CannedQrzClient([qrz_xml("<Error>Session Timeout</Error>"), found_resp], session_key="old",
+                             optimistic=True, session_store=store)
+    store.put(client.data_source, "user", "abc")
+    assert client.search("W1AW").callsign == "W1AW"
+    assert [q.get("s", "login") for q in client.queries] == ["old", "abc"]
+
+
+async def stored_session_searches(tmp_path):
+    async with QrzStubServer() as server:
+        store = SqliteSessionStore(tmp_path / "sessions.db")
+        store.put(DataSource.QRZ, "user", "stale")
+        clients = [await QrzAsyncClient.new("user", "pass", optimistic=True, session_store=store) for _ in range(3)]
+        try:
+            for client in clients:
+                client._base_url = server.url
+                await client.search("W1AW")
+        finally:
+            for client in clients:
+                await client.close_session()
+        return server, store
+
+
+def test_async_session_store(tmp_path):
+    server, store = asyncio.run(stored_session_searches(tmp_path))
+    # every client tries the stale key once, but only the first one logs in
+    assert server.logins == 1
+    assert server.searches == 6
+    assert store.get(DataSource.QRZ, "user")[0] == server.key
+
+
+def test_qrz_daily_budget():
+    def counted(count):
+        return qrz_xml(f"<Key>abc</Key><Count>{count}</Count>", "<Callsign><call>W1AW</call></Callsign>")
+
+    client = CannedQrzClient([counted(9), counted(10)], session_key="abc", optimistic=True, daily_budget=10,
+                             cache=LookupCache())
+    assert client.lookup_count is None
+    client.search("W1AW")
+    assert client.lookup_count == 9
+    client.search("K1AA")
+    assert client.lookup_count == 10
+    assert client.search("W1AW").callsign == "W1AW"
+    with pytest.raises(QuotaExceededError):
+        client.search("N0CALL")
+    assert len(client.queries) == 2
+    client._lookup_count_day = date(2000, 1, 1)
+    client.responses.append(counted(11))
+    client.search("N0CALL")
+    assert len(client.queries) == 3
+    client.daily_budget = None
+    client.responses.append(counted(12))
+    client.search("N1CALL")
+    assert client.lookup_count == 12
+
+
+class CountingQrzClient(EmulatedQrzClient):
+    """Emulated QRZ client that reports a running lookup count, like QRZ does"""
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+
+    def _do_query(self, **query) -> bytes:
+        time.sleep(0.05)
+        with self.lock:
+            self.searches += 1
+            count = self.searches
+        return qrz_xml(f"<Key>abc</Key><Count>{count}</Count>",
+                       f"<Callsign><call>{query['callsign']}</call></Callsign>")
+
+
+def test_qrz_daily_budget_concurrent():
+    client = CountingQrzClient(session_key="abc", optimistic=True, daily_budget=5)
+    client.search("W1AW")
+    results = client.search_many([f"W{i}AW" for i in range(2, 20)], concurrency=8)
+    # lookups in flight count against the budget, so a batch can't overshoot it
+    assert client.searches == 5
+    assert client.lookup_count == 5
+    assert sum(isinstance(r, QuotaExceededError) for _, r in results) == 14
+    assert client._lookups_in_flight == 0
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from callsignlookuptools.common import ratelimit
+from callsignlookuptools.common.enums import DataSource
+from callsignlookuptools import RateLimiter, TokenBucket
+from tests.stubserver import FlakyQrzClient, stub_qrz_client
+
+
+def test_token_bucket(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(ratelimit, "monotonic", lambda: now[0])
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(5)] == [0, 0, 0, 0.5, 1.0]
+    now[0] += 1.0
+    assert bucket.reserve() == 0.5
+    now[0] += 60
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 0, 0.5]
+
+
+def test_unlimited_source():
+    limiter = RateLimiter()
+    limiter.set_limit(DataSource.QRZ, rate=1)
+    limiter.remove_limit(DataSource.QRZ)
+    assert limiter.get_limit(DataSource.QRZ) is None
+    assert all(limiter.reserve(DataSource.QRZ) == 0 for _ in range(100))
+
+
+def test_default_limiter_shared():
+    assert FlakyQrzClient([]).rate_limiter is FlakyQrzClient([]).rate_limiter is ratelimit.default_rate_limiter
+
+
+def test_limiter_shared_between_clients():
+    limiter = RateLimiter()
+    limiter.set_limit(DataSource.QRZ, rate=50, burst=2)
+    clients = [FlakyQrzClient([]) for _ in range(2)]
+    for client in clients:
+        client.rate_limiter = limiter
+    start = time.monotonic()
+    for i in range(6):
+        clients[i % 2].search(f"W{i}AW")
+    assert time.monotonic() - start >= 0.08 - 0.01
+
+
+def test_limiter_copy():
+    limiter = RateLimiter()
+    limiter.set_limit(DataSource.QRZ, rate=1)
+    copy = limiter.copy()
+    assert limiter.reserve(DataSource.QRZ) == copy.reserve(DataSource.QRZ) == 0
+    assert copy.get_limit(DataSource.QRZ).rate == 1
+    assert copy.get_limit(DataSource.HAMQTH) is None
+
+
+async def limited_searches(limiter):
+    async with stub_qrz_client(optimistic=True) as (server, client):
+        client.rate_limiter = limiter
+        start = time.monotonic()
+        await asyncio.gather(*[client.search(f"W{i}AW") for i in range(6)])
+        return time.monotonic() - start
+
+
+def test_async_limiter_waits():
+    limiter = RateLimiter()
+    limiter.set_limit(DataSource.QRZ, rate=50, burst=2)
+    assert asyncio.run(limited_searches(limiter)) >= 0.08 - 0.01
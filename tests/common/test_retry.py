@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from callsignlookuptools.common import functions, retry
+from callsignlookuptools import (QrzSyncClient, CallsignLookupError, CallsignNotFoundError,
+                                 LookupConnectionError, LookupHttpError, RetryPolicy)
+from tests.stubserver import FlakyQrzClient, stub_qrz_client
+
+
+next_delay_test_data = [
+    pytest.param(1, LookupHttpError("", status=503), 1.0, id="first_retry"),
+    pytest.param(3, LookupHttpError("", status=503), 4.0, id="third_retry"),
+    pytest.param(5, LookupHttpError("", status=503), 10.0, id="capped"),
+    pytest.param(6, LookupHttpError("", status=503), None, id="out_of_attempts"),
+    pytest.param(1, LookupHttpError("", status=429, retry_after=7), 7.0, id="retry_after"),
+    pytest.param(1, LookupHttpError("", status=429, retry_after=60), None, id="retry_after_too_long"),
+    pytest.param(1, LookupHttpError("", status=404), None, id="not_retryable_status"),
+    pytest.param(1, LookupConnectionError(""), 1.0, id="connection_error"),
+    pytest.param(1, CallsignNotFoundError(""), None, id="not_found"),
+    pytest.param(1, CallsignLookupError(""), None, id="other_error"),
+]
+
+
+@pytest.mark.parametrize("attempt,error,expected", next_delay_test_data)
+def test_next_delay(attempt, error, expected):
+    policy = RetryPolicy(max_attempts=6, backoff=1, max_backoff=10, jitter=0)
+    assert policy.next_delay(attempt, error) == expected
+
+
+def test_next_delay_jitter(monkeypatch):
+    monkeypatch.setattr(retry, "random", lambda: 0.5)
+    assert RetryPolicy(backoff=2, jitter=0.5).next_delay(1, LookupConnectionError("")) == 1.5
+
+
+@pytest.mark.parametrize("value,expected", [("120", 120.0), ("", None), ("soon", None),
+                                            ("Wed, 21 Oct 2015 07:28:00 GMT", 0.0)])
+def test_parse_retry_after(value, expected):
+    assert functions.parse_retry_after(value) == expected
+
+
+def test_sync_retry_recovers():
+    client = FlakyQrzClient([LookupConnectionError("reset"), LookupHttpError("busy", status=503)],
+                            retry=RetryPolicy(backoff=0))
+    assert client.search("W1AW").callsign == "W1AW"
+    assert client.attempts == 3
+
+
+def test_sync_retry_gives_up():
+    client = FlakyQrzClient([LookupHttpError("busy", status=503)] * 3, retry=RetryPolicy(backoff=0))
+    with pytest.raises(LookupHttpError):
+        client.search("W1AW")
+    assert client.attempts == 3
+
+
+def test_sync_no_retry_by_default():
+    client = FlakyQrzClient([LookupHttpError("busy", status=503)])
+    with pytest.raises(LookupHttpError):
+        client.search("W1AW")
+    assert client.attempts == 1
+
+
+def test_sync_connection_error_wrapped():
+    client = QrzSyncClient("user", "pass", session_key="abc", optimistic=True)
+    client._base_url = "http://127.0.0.1:9/xml?"
+    with pytest.raises(LookupConnectionError):
+        client.search("W1AW")
+
+
+async def flaky_searches(failures, retry_after=""):
+    async with stub_qrz_client(optimistic=True, retry=RetryPolicy(backoff=0.01, max_backoff=1)) as (server, client):
+        server.failures = failures
+        server.retry_after = retry_after
+        return server, await client.search("W1AW")
+
+
+def test_async_retry_recovers():
+    server, result = asyncio.run(flaky_searches([503, 429], retry_after="0"))
+    assert result.callsign == "W1AW"
+    assert server.failures == []
+
+
+def test_async_retry_after_too_long():
+    with pytest.raises(LookupHttpError) as exc_info:
+        asyncio.run(flaky_searches([429], retry_after="120"))
+    assert (exc_info.value.status, exc_info.value.retry_after) == (429, 120)
@@ -0,0 +1,48 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from callsignlookuptools.common import sessionstore
+from callsignlookuptools.common.enums import DataSource
+
+
+def test_session_store_shared(tmp_path):
+    writer = sessionstore.SqliteSessionStore(tmp_path / "sessions.db")
+    reader = sessionstore.SqliteSessionStore(tmp_path / "sessions.db")
+    writer.put(DataSource.QRZ, "user", "abc", 1000.0, None)
+    assert reader.get(DataSource.QRZ, "user") == ("abc", 1000.0, None)
+    assert reader.get(DataSource.QRZ, "other") is None
+    assert reader.get(DataSource.HAMQTH, "user") is None
+    writer.put(DataSource.QRZ, "user", "def")
+    assert reader.get(DataSource.QRZ, "user") == ("def", None, None)
+    assert len(reader) == 1
+    writer.close()
+    reader.close()
+
+
+def test_session_store_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sessionstore, "time", lambda: now[0])
+    store = sessionstore.SqliteSessionStore(tmp_path / "sessions.db")
+    store.put(DataSource.HAMQTH, "user", "abc", 1000.0, 4600.0)
+    now[0] += 3599
+    assert store.get(DataSource.HAMQTH, "user") is not None
+    now[0] += 1
+    assert store.get(DataSource.HAMQTH, "user") is None
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="no Unix file permissions on Windows")
+def test_session_store_private(tmp_path):
+    old_umask = os.umask(0o022)
+    try:
+        store = sessionstore.SqliteSessionStore(tmp_path / "sessions.db")
+        store.put(DataSource.QRZ, "user", "abc")
+        files = list(tmp_path.iterdir())
+        assert {f.name for f in files} >= {"sessions.db", "sessions.db-wal", "sessions.db-shm"}
+        for f in files:
+            assert stat.S_IMODE(f.stat().st_mode) == 0o600, f.name
+        store.close()
+    finally:
+        os.umask(old_umask)
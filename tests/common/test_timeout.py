@@ -0,0 +1,115 @@
+import asyncio
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from callsignlookuptools import (QrzSyncClient, LookupConnectionError, LookupTimeoutError,
+                                 RateLimiter, RetryPolicy, Timeout)
+from callsignlookuptools.common.enums import DataSource
+from tests.stubserver import qrz_xml, stub_qrz_client
+
+
+login_resp = qrz_xml("<Key>abc</Key>")
+
+
+class SlowQrzClient(QrzSyncClient):
+    """QRZ client where every request takes ``delay`` seconds, unless its read timeout is shorter"""
+    def __init__(self, delay, **kwargs):
+        super().__init__("user", "pass", session_key="stale", **kwargs)
+        self.delay = delay
+        self.timeouts = []
+
+    def _do_query(self, **query) -> bytes:
+        connect, read = self._request_timeout()
+        self.timeouts.append((connect, read))
+        if read is not None and read < self.delay:
+            time.sleep(read)
+            raise LookupTimeoutError("Timed out waiting for QRZ")
+        time.sleep(self.delay)
+        if "callsign" in query:
+            return qrz_xml("<Key>abc</Key>", f"<Callsign><call>{query['callsign']}</call></Callsign>")
+        return qrz_xml("<Error>Session Timeout</Error>") if query.get("s") == "stale" else login_resp
+
+
+def test_timeout_exception_hierarchy():
+    assert issubclass(LookupTimeoutError, LookupConnectionError)
+
+
+def test_sync_request_timeouts():
+    client = SlowQrzClient(0.01, timeout=Timeout(connect=2, read=5))
+    assert client.search("W1AW").callsign == "W1AW"
+    assert client.timeouts == [(2, 5)] * 3
+
+
+def test_sync_deadline_covers_login():
+    client = SlowQrzClient(0.05, retry=RetryPolicy(backoff=0))
+    start = time.monotonic()
+    with pytest.raises(LookupTimeoutError):
+        client.search("W1AW", deadline=0.12)
+    assert time.monotonic() - start < 0.2
+    # the session check and login used up most of the deadline, so the search was cut short
+    reads = [read for _, read in client.timeouts]
+    assert len(reads) == 3
+    assert 0.12 >= reads[0] > reads[1] > reads[2] and reads[2] < 0.05
+
+
+def test_sync_default_deadline():
+    client = SlowQrzClient(0.05, timeout=Timeout(total=0.02))
+    with pytest.raises(LookupTimeoutError):
+        client.search("W1AW")
+    assert len(client.timeouts) == 1
+
+
+def test_sync_follower_deadline():
+    client = SlowQrzClient(0.3, optimistic=True)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        leader = executor.submit(client.search, "W1AW")
+        time.sleep(0.05)
+        start = time.monotonic()
+        # waits on the leader's lookup, which takes longer than this search's deadline
+        with pytest.raises(LookupTimeoutError):
+            client.search("W1AW", deadline=0.05)
+        assert time.monotonic() - start < 0.2
+        assert leader.result().callsign == "W1AW"
+    assert len(client.timeouts) == 1
+
+
+def test_sync_deadline_caps_rate_limit_wait():
+    limiter = RateLimiter()
+    limiter.set_limit(DataSource.QRZ, rate=1)
+    client = SlowQrzClient(0, optimistic=True)
+    client.rate_limiter = limiter
+    client.search("W1AW")
+    start = time.monotonic()
+    with pytest.raises(LookupTimeoutError):
+        client.search("W2AW", deadline=0.05)
+    assert time.monotonic() - start < 0.3
+    assert len(client.timeouts) == 1
+
+
+def test_sync_read_timeout():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        client = QrzSyncClient("user", "pass", session_key="abc", optimistic=True, timeout=Timeout(read=0.1))
+        client._base_url = "http://{}:{}/xml?".format(*server.getsockname())
+        with pytest.raises(LookupTimeoutError):
+            client.search("W1AW")
+
+
+async def slow_search(timeout, deadline=None):
+    async with stub_qrz_client(delay=0.5, optimistic=True, timeout=timeout) as (server, client):
+        start = time.monotonic()
+        with pytest.raises(LookupTimeoutError):
+            await client.search("W1AW", deadline=deadline)
+        return time.monotonic() - start
+
+
+def test_async_read_timeout():
+    assert asyncio.run(slow_search(Timeout(read=0.05))) < 0.3
+
+
+def test_async_deadline():
+    assert asyncio.run(slow_search(Timeout(), deadline=0.05)) < 0.3
@@ -0,0 +1,39 @@
+import asyncio
+
+from callsignlookuptools import (QrzSyncClient, CallookSyncClient, QrzAsyncClient, HamQthAsyncClient,
+                                 CallookAsyncClient, Transport)
+from tests.stubserver import QrzStubServer
+
+
+def test_sync_shared_session():
+    transport = Transport(max_per_host=32, keepalive=0)
+    qrz = QrzSyncClient("user", "pass", transport=transport)
+    callook = CallookSyncClient(transport=transport)
+    assert qrz.session is callook.session is transport.requests_session()
+    assert qrz.transport is transport
+    assert qrz.session.get_adapter("https://xmldata.qrz.com/")._pool_maxsize == 32
+    assert qrz.session.headers["Connection"] == "close"
+    transport.close()
+    assert transport.requests_session() is not qrz.session
+
+
+async def shared_async_clients():
+    transport = Transport(max_connections=20, max_per_host=5, dns_cache_ttl=60)
+    async with QrzStubServer() as server:
+        qrz = await QrzAsyncClient.new("user", "pass", session_key=server.key, optimistic=True, transport=transport)
+        hamqth = await HamQthAsyncClient.new("user", "pass", transport=transport)
+        callook = await CallookAsyncClient.new(transport=transport)
+        qrz._base_url = server.url
+        assert qrz.session is hamqth.session is callook.session
+        connector = qrz.session.connector
+        assert (connector.limit, connector.limit_per_host, connector.use_dns_cache) == (20, 5, True)
+        await asyncio.gather(*[qrz.search(f"W{i}AW") for i in range(10)])
+        await hamqth.close_session()
+        assert not qrz.session.closed
+        assert (await qrz.search("W1AW")).callsign == "W1AW"
+        await transport.aclose()
+        assert qrz.session.closed
+
+
+def test_async_shared_session():
+    asyncio.run(shared_async_clients())
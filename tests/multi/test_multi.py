@@ -0,0 +1,340 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from callsignlookuptools.common.dataclasses import Name, Qsl
+from callsignlookuptools.common.enums import CallsignType, DataSource, QslStatus
+from callsignlookuptools.multi.multi import is_missing
+from callsignlookuptools import (QrzSyncClient, QrzAsyncClient, FallbackSyncClient, FallbackAsyncClient,
+                                 AggregateAsyncClient, MergedCallsignData, AllSourcesFailedError, CallsignNotFoundError,
+                                 CircuitBreaker, CircuitOpenError, LookupConnectionError, LookupTimeoutError,
+                                 SourceStats, AccountPoolAsyncClient, CallsignLookupError, QuotaExceededError,
+                                 RateLimiter)
+from tests.stubserver import qrz_xml
+
+
+not_found = qrz_xml("<Error>Not found: W1AW</Error>")
+
+
+def found(source: DataSource) -> bytes:
+    return qrz_xml("<Key>abc</Key>", f"<Callsign><call>W1AW</call><name>{source.name}</name></Callsign>")
+
+
+class FakeSyncClient(QrzSyncClient):
+    """Sync client for any source that answers every search with the same QRZ-style response or error"""
+    def __init__(self, source, outcome, **kwargs):
+        super().__init__("user", "pass", session_key="abc", optimistic=True, **kwargs)
+        self._data_source = source
+        self.outcome = outcome
+        self.searches = 0
+
+    def _do_query(self, **query) -> bytes:
+        self.searches += 1
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+class FakeAsyncClient(QrzAsyncClient):
+    """Async client for any source that answers every search with the same QRZ-style response or error,
+    after a delay"""
+    def __init__(self, source, outcome, delay=0.0, **kwargs):
+        super().__init__("user", "pass", session_key="abc", optimistic=True, **kwargs)
+        self._data_source = source
+        self.outcome = outcome
+        self.delay = delay
+        self.searches = 0
+        self.cancelled = 0
+
+    async def _do_query(self, **query) -> bytes:
+        self.searches += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+def test_fallback_falls_through():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record(DataSource.QRZCQ, LookupConnectionError(""))
+    clients = [FakeSyncClient(DataSource.QRZ, not_found),
+               FakeSyncClient(DataSource.QRZCQ, found(DataSource.QRZCQ)),
+               FakeSyncClient(DataSource.HAMQTH, LookupConnectionError("down")),
+               FakeSyncClient(DataSource.CALLOOK, found(DataSource.CALLOOK))]
+    clients[1].circuit_breaker = breaker
+    client = FallbackSyncClient(clients)
+    assert client.search("W1AW").name.name == "CALLOOK"
+    assert clients[1].searches == 0
+    stats = client.stats
+    assert (stats[DataSource.QRZ].not_found, stats[DataSource.QRZCQ].circuit_open,
+            stats[DataSource.HAMQTH].errors, stats[DataSource.CALLOOK].successes) == (1, 1, 1, 1)
+    assert stats[DataSource.CALLOOK].latency() is not None
+    assert stats[DataSource.HAMQTH].latency() is None
+
+
+def test_fallback_stops_at_first_result():
+    clients = [FakeSyncClient(DataSource.QRZ, found(DataSource.QRZ)),
+               FakeSyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH))]
+    assert FallbackSyncClient(clients).search("W1AW").name.name == "QRZ"
+    assert clients[1].searches == 0
+
+
+def test_fallback_all_not_found():
+    clients = [FakeSyncClient(DataSource.QRZ, not_found), FakeSyncClient(DataSource.HAMQTH, not_found)]
+    with pytest.raises(CallsignNotFoundError):
+        FallbackSyncClient(clients).search("W1AW")
+
+
+def test_fallback_all_failed():
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record(DataSource.HAMQTH, LookupConnectionError(""))
+    clients = [FakeSyncClient(DataSource.QRZ, not_found), FakeSyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH))]
+    clients[1].circuit_breaker = breaker
+    with pytest.raises(AllSourcesFailedError) as exc_info:
+        FallbackSyncClient(clients).search("W1AW")
+    assert isinstance(exc_info.value.errors[DataSource.QRZ], CallsignNotFoundError)
+    assert isinstance(exc_info.value.errors[DataSource.HAMQTH], CircuitOpenError)
+
+
+def test_fallback_async():
+    clients = [FakeAsyncClient(DataSource.QRZ, LookupConnectionError("down")),
+               FakeAsyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH))]
+    client = FallbackAsyncClient(clients)
+    assert asyncio.run(client.search("W1AW")).name.name == "HAMQTH"
+    assert (client.stats[DataSource.QRZ].errors, client.stats[DataSource.HAMQTH].successes) == (1, 1)
+
+
+def test_source_stats_latency():
+    stats = SourceStats(window=4)
+    for started in (-1.0, -2.0, -3.0, -4.0, -5.0):
+        stats.record(started)
+    assert stats.successes == 5
+    assert stats.latency(0) < stats.latency(0.5) < stats.latency(1)
+
+
+async def timed_search(client):
+    start = asyncio.get_running_loop().time()
+    data = await client.search("W1AW")
+    return data, asyncio.get_running_loop().time() - start
+
+
+async def search_and_settle(client, source):
+    """Search, then give the lookups that lost a few event loop turns to stop, and report whether the source's
+    lookups were cancelled and are no longer in flight. This has to be checked before ``asyncio.run()`` returns,
+    as it cancels any tasks still running."""
+    data, elapsed = await timed_search(client)
+    await asyncio.sleep(0.01)
+    return data, elapsed, source.cancelled, dict(source._inflight)
+
+
+def test_hedged_search_slow_primary():
+    clients = [FakeAsyncClient(DataSource.QRZ, found(DataSource.QRZ), delay=1.0),
+               FakeAsyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH), delay=0.01)]
+    client = FallbackAsyncClient(clients, hedge_delay=0.05)
+    data, elapsed, cancelled, inflight = asyncio.run(search_and_settle(client, clients[0]))
+    assert data.name.name == "HAMQTH"
+    assert elapsed < 0.5
+    assert client.hedges == 1
+    assert client.stats[DataSource.QRZ].successes == 0
+    # the slow source's request is stopped, not left running in the background
+    assert (clients[0].searches, cancelled, inflight) == (1, 1, {})
+
+
+def test_hedged_search_fast_primary():
+    clients = [FakeAsyncClient(DataSource.QRZ, found(DataSource.QRZ), delay=0.01),
+               FakeAsyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH))]
+    client = FallbackAsyncClient(clients, hedge_delay=0.2)
+    data, _ = asyncio.run(timed_search(client))
+    assert data.name.name == "QRZ"
+    assert (client.hedges, clients[1].searches) == (0, 0)
+
+
+def test_hedged_search_falls_through():
+    clients = [FakeAsyncClient(DataSource.QRZ, found(DataSource.QRZ), delay=0.2),
+               FakeAsyncClient(DataSource.HAMQTH, not_found, delay=0.01),
+               FakeAsyncClient(DataSource.CALLOOK, found(DataSource.CALLOOK), delay=1.0)]
+    client = FallbackAsyncClient(clients, hedge_delay=0.05)
+    data, elapsed = asyncio.run(timed_search(client))
+    assert data.name.name == "QRZ"
+    assert elapsed < 0.5
+
+
+def test_hedged_search_failure_falls_through_immediately():
+    clients = [FakeAsyncClient(DataSource.QRZ, found(DataSource.QRZ), delay=1.0),
+               FakeAsyncClient(DataSource.HAMQTH, not_found, delay=0.01),
+               FakeAsyncClient(DataSource.CALLOOK, found(DataSource.CALLOOK), delay=0.01)]
+    client = FallbackAsyncClient(clients, hedge_delay=0.2)
+    data, elapsed = asyncio.run(timed_search(client))
+    # the failed hedge doesn't wait another hedge delay before trying the next source
+    assert data.name.name == "CALLOOK"
+    assert elapsed < 0.35
+    assert client.hedges == 1
+
+
+def test_hedge_quantile():
+    clients = [FakeAsyncClient(DataSource.QRZ, found(DataSource.QRZ)),
+               FakeAsyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH))]
+    client = FallbackAsyncClient(clients, hedge_delay=1.0, hedge_quantile=0.95)
+    assert client._hedge_delay_for(clients[0]) == 1.0
+    assert client._hedge_delay_for(clients[1]) is None
+    for i in range(20):
+        client.stats[DataSource.QRZ].record(time.monotonic() - i / 100)
+    assert client._hedge_delay_for(clients[0]) == pytest.approx(0.19, abs=0.01)
+
+
+def callsign_xml(fields: str) -> bytes:
+    return qrz_xml("<Key>abc</Key>", f"<Callsign><call>W1AW</call>{fields}</Callsign>")
+
+
+def test_aggregate_merges_fields():
+    clients = [FakeAsyncClient(DataSource.QRZ, callsign_xml("<name>ARRL</name><county>Hartford</county>")),
+               FakeAsyncClient(DataSource.HAMQTH, callsign_xml("<name>Hiram</name><email>w1aw@example.com</email>"
+                                                               "<county>Newington</county>")),
+               FakeAsyncClient(DataSource.QRZCQ, not_found),
+               FakeAsyncClient(DataSource.CALLOOK, found(DataSource.CALLOOK), delay=1.0)]
+    client = AggregateAsyncClient(clients, precedence=[DataSource.HAMQTH], deadline=0.2,
+                                  field_precedence={"county": [DataSource.QRZ]})
+    start = time.monotonic()
+    data = asyncio.run(client.search("W1AW"))
+    assert time.monotonic() - start < 0.5
+    assert isinstance(data, MergedCallsignData)
+    assert data.data_source == DataSource.HAMQTH
+    assert (data.name.name, data.email, data.county) == ("Hiram", "w1aw@example.com", "Hartford")
+    assert data.field_sources["name"] == DataSource.HAMQTH
+    assert data.field_sources["county"] == DataSource.QRZ
+    assert data.field_sources["email"] == DataSource.HAMQTH
+    assert "frn" not in data.field_sources
+    assert set(data.results) == {DataSource.QRZ, DataSource.HAMQTH}
+    assert client.stats[DataSource.CALLOOK].errors == 1
+
+
+def test_aggregate_merges_qsl():
+    clients = [FakeAsyncClient(DataSource.QRZ, callsign_xml("<name>ARRL</name>")),
+               FakeAsyncClient(DataSource.HAMQTH, callsign_xml("<lotw>1</lotw><eqsl>1</eqsl><qslmgr>DIRECT</qslmgr>"))]
+    data = asyncio.run(AggregateAsyncClient(clients, deadline=0.2).search("W1AW"))
+    # QRZ's qsl has no info, so it doesn't hide HamQTH's
+    assert data.field_sources["qsl"] == DataSource.HAMQTH
+    assert (data.qsl.lotw, data.qsl.eqsl, data.qsl.info) == (QslStatus.YES, QslStatus.YES, "DIRECT")
+
+
+def test_aggregate_timeout_error():
+    clients = [FakeAsyncClient(DataSource.QRZ, found(DataSource.QRZ), delay=1.0)]
+    with pytest.raises(AllSourcesFailedError) as exc_info:
+        asyncio.run(AggregateAsyncClient(clients, deadline=0.01).search("W1AW"))
+    assert isinstance(exc_info.value.errors[DataSource.QRZ], LookupTimeoutError)
+
+
+def test_aggregate_deadline_cancels_slow_source():
+    clients = [FakeAsyncClient(DataSource.QRZ, found(DataSource.QRZ), delay=0.01),
+               FakeAsyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH), delay=1.0)]
+    client = AggregateAsyncClient(clients, deadline=0.05)
+    data, elapsed, cancelled, inflight = asyncio.run(search_and_settle(client, clients[1]))
+    assert set(data.results) == {DataSource.QRZ}
+    assert elapsed < 0.5
+    assert (clients[1].searches, cancelled, inflight) == (1, 1, {})
+
+
+def test_aggregate_all_missed():
+    clients = [FakeAsyncClient(DataSource.QRZ, not_found),
+               FakeAsyncClient(DataSource.HAMQTH, found(DataSource.HAMQTH), delay=1.0)]
+    with pytest.raises(AllSourcesFailedError):
+        asyncio.run(AggregateAsyncClient(clients, deadline=0.05).search("W1AW"))
+
+
+@pytest.mark.parametrize("value,expected", [(None, True), ("", True), ([], True), (CallsignType.NONE, True),
+                                            (QslStatus.UNKNOWN, True), (Name(), True), (Qsl(), True), ("x", False),
+                                            (0, False), (QslStatus.NO, False), (Name(name="x"), False),
+                                            (Qsl(lotw=QslStatus.YES), False)])
+def test_is_missing(value, expected):
+    assert is_missing(value) is expected
+
+
+def accounts(*outcomes, delay=0.0):
+    clients = [FakeAsyncClient(DataSource.QRZ, outcome, delay) for outcome in outcomes]
+    for i, client in enumerate(clients):
+        client.username = f"user{i}"
+    return clients
+
+
+async def pooled_searches(client, count):
+    return await asyncio.gather(*[client.search(f"W{i}AW") for i in range(count)])
+
+
+def test_account_pool_spreads_load():
+    clients = accounts(*[found(DataSource.QRZ)] * 3, delay=0.02)
+    client = AccountPoolAsyncClient(clients)
+    asyncio.run(pooled_searches(client, 30))
+    assert [c.searches for c in clients] == [10, 10, 10]
+    asyncio.run(client.search("W1AW"))
+    assert sorted(c.searches for c in clients) == [10, 10, 11]
+    assert sum(s.successes for s in client.stats.values()) == 31
+
+
+def test_account_pool_rate_limits_each_account():
+    limiter = RateLimiter()
+    limiter.set_limit(DataSource.QRZ, rate=20)
+    clients = accounts(found(DataSource.QRZ), found(DataSource.QRZ))
+    for c in clients:
+        c.rate_limiter = limiter
+    client = AccountPoolAsyncClient(clients)
+    assert clients[0].rate_limiter is limiter
+    assert clients[1].rate_limiter is not limiter
+    assert clients[1].rate_limiter.get_limit(DataSource.QRZ).rate == 20
+    start = time.monotonic()
+    asyncio.run(pooled_searches(client, 12))
+    # one account alone would take 0.55s
+    assert time.monotonic() - start < 0.4
+
+
+def test_account_pool_rotates_out_failing_accounts():
+    clients = accounts(CallsignLookupError("Login Failed: bad password"), found(DataSource.QRZ))
+    client = AccountPoolAsyncClient(clients, failure_threshold=1, cooldown=0.2)
+    assert asyncio.run(client.search("W1AW")).callsign == "W1AW"
+    assert client.in_rotation == ["user1"]
+    asyncio.run(pooled_searches(client, 5))
+    assert [c.searches for c in clients] == [1, 6]
+    assert (client.stats["user0"].errors, client.stats["user1"].successes) == (1, 6)
+    time.sleep(0.2)
+    assert client.in_rotation == ["user0", "user1"]
+
+
+def test_account_pool_rotates_out_exhausted_accounts():
+    clients = accounts(found(DataSource.QRZ), found(DataSource.QRZ))
+    clients[0].daily_budget = 100
+    clients[0]._lookup_count, clients[0]._lookup_count_day = 100, datetime.now(timezone.utc).date()
+    client = AccountPoolAsyncClient(clients)
+    assert asyncio.run(client.search("W1AW")).callsign == "W1AW"
+    assert client.in_rotation == ["user1"]
+    assert [c.searches for c in clients] == [0, 1]
+
+
+@pytest.mark.parametrize("outcome,error", [(not_found, CallsignNotFoundError),
+                                           (LookupConnectionError("down"), LookupConnectionError)])
+def test_account_pool_source_errors_not_retried(outcome, error):
+    clients = accounts(outcome, outcome)
+    client = AccountPoolAsyncClient(clients)
+    with pytest.raises(error):
+        asyncio.run(client.search("W1AW"))
+    assert sum(c.searches for c in clients) == 1
+    assert client.in_rotation == ["user0", "user1"]
+
+
+def test_account_pool_all_accounts_failed():
+    client = AccountPoolAsyncClient(accounts(QuotaExceededError("quota"), QuotaExceededError("quota")))
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(client.search("W1AW"))
+    with pytest.raises(CallsignLookupError, match="account is in rotation"):
+        asyncio.run(client.search("W1AW"))
+
+
+def test_account_pool_validation():
+    with pytest.raises(ValueError):
+        AccountPoolAsyncClient([FakeAsyncClient(DataSource.QRZ, not_found), FakeAsyncClient(DataSource.QRZ, not_found)])
+    with pytest.raises(ValueError):
+        AccountPoolAsyncClient(accounts(not_found) + [FakeAsyncClient(DataSource.HAMQTH, not_found)])
@@ -0,0 +1,103 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from aiohttp import web
+
+from callsignlookuptools import QrzSyncClient, QrzAsyncClient
+
+
+def qrz_xml(session: str, callsign: str = "") -> bytes:
+    return (f'<QRZDatabase xmlns="http://xmldata.qrz.com" version="1.34">{callsign}'
+            f'<Session>{session}</Session></QRZDatabase>').encode()
+
+
+class QrzStubServer:
+    """A local stand-in for the QRZ XML API that counts the requests it receives"""
+    def __init__(self, key: str = "validkey", delay: float = 0.0):
+        self.key = key
+        self.delay = delay
+        self.logins = 0
+        self.checks = 0
+        self.searches = 0
+        self.active = 0
+        self.max_active = 0
+        #: HTTP error statuses to answer the next requests with, in order
+        self.failures: list[int] = []
+        #: the Retry-After header sent with failures, if any
+        self.retry_after = ""
+        self.url = ""
+        self._runner = web.AppRunner(web.Application())
+
+    async def handle(self, request: web.Request) -> web.Response:
+        query = request.query
+        self.active += 1
+        self.max_active = max(self.active, self.max_active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if self.failures:
+            headers = {"Retry-After": self.retry_after} if self.retry_after else {}
+            return web.Response(status=self.failures.pop(0), headers=headers)
+        if "username" in query:
+            self.logins += 1
+            return web.Response(body=qrz_xml(f"<Key>{self.key}</Key>"))
+        if "callsign" in query:
+            self.searches += 1
+        else:
+            self.checks += 1
+        if query.get("s") != self.key:
+            return web.Response(body=qrz_xml("<Error>Invalid session key</Error>"))
+        if "callsign" in query:
+            return web.Response(body=qrz_xml(f"<Key>{self.key}</Key>",
+                                             f"<Callsign><call>{query['callsign']}</call></Callsign>"))
+        return web.Response(body=qrz_xml(f"<Key>{self.key}</Key>"))
+
+    async def __aenter__(self) -> "QrzStubServer":
+        self._runner.app.router.add_get("/xml", self.handle)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}/xml?"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._runner.cleanup()
+
+
+@asynccontextmanager
+async def stub_qrz_client(session_key: Optional[str] = None, delay: float = 0.0,
+                          **kwargs) -> AsyncIterator[tuple[QrzStubServer, QrzAsyncClient]]:
+    """Start a :class:`QrzStubServer` and an async QRZ client that sends its requests to it
+
+    :param session_key: the client's session key. Defaults to the key the server accepts.
+    :param delay: how long the server takes to answer each request, in seconds
+    :param kwargs: other arguments for :meth:`QrzAsyncClient.new`
+    """
+    async with QrzStubServer(delay=delay) as server:
+        if session_key is None:
+            session_key = server.key
+        client = await QrzAsyncClient.new("user", "pass", session_key=session_key, **kwargs)
+        client._base_url = server.url
+        try:
+            yield server, client
+        finally:
+            await client.close_session()
+
+
+class FlakyQrzClient(QrzSyncClient):
+    """QRZ client that raises the given errors before answering with a canned response"""
+    found_resp = qrz_xml("<Key>abc</Key>", "<Callsign><call>W1AW</call></Callsign>")
+
+    def __init__(self, errors, **kwargs):
+        super().__init__("user", "pass", session_key="abc", optimistic=True, **kwargs)
+        self.errors = list(errors)
+        self.attempts = 0
+
+    def _do_query(self, **query) -> bytes:
+        self.attempts += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.found_resp